@@ -0,0 +1,190 @@
+"""Executions as point sets, and a check that a point set is arborally
+satisfied.
+
+The geometric view of an execution has a point (t, k) for every key k
+touched at access t, the touched keys being those on the search path. A
+point set is arborally satisfied when any two points not on a common row
+or column span a rectangle holding a third, and the touched points of any
+execution are (Demaine, Harmon, Iacono, Kane and Patrascu 2009).
+
+Only the points nearest each new point need checking. Sweeping the rows
+in time order with the last-touch time of every key in a max segment
+tree, a point (t, x) opens an empty rectangle exactly when the nearest key
+left of x touched later than x was lies strictly between x and the next
+point of row t on the left, or the same on the right: one nearest-greater
+search per point, so a set of p points is checked in O(p log p)."""
+from __future__ import print_function
+
+import unittest
+
+from random import randrange, seed
+from time import time
+
+import numpy as np
+
+import bst
+import pathcodes
+from arraysim import jit
+from maxtree import assign, build, ngl, ngr
+
+
+def execution_points(execution):
+    """(time, key) array of the nodes on each search path of an execution
+    yielding (tree, node) pairs before adjusting, as bst.mr_execution,
+    bst.splay_execution and geometry.GreedyExecution do."""
+    points = [(t, y.key) for t, (_, x) in enumerate(execution)
+              for y in x.path()]
+    return np.array(points, dtype=np.int64).reshape(-1, 2)
+
+
+def pathcodes_points(X, optype=pathcodes.splay, cursor=None):
+    """(time, key) array of accessing X with optype on pathcodes nodes,
+    from the tree with the given cursor movements (by default the right
+    path on the keys of X)."""
+    keys = sorted(set(X))
+    if cursor is None:
+        cursor = "r"*(len(keys)-1)
+    nodes = pathcodes.Node.from_cursor(cursor).inorder()
+    key = dict(zip(nodes, keys))
+    node = dict(zip(keys, nodes))
+    points = []
+    for t, k in enumerate(X):
+        x = node[k]
+        points.extend((t, key[y]) for y in x.path())
+        optype(x)
+    return np.array(points, dtype=np.int64).reshape(-1, 2)
+
+
+def topdown_points(T, X):
+    """(time, key) array of accessing X in the topdownsplay tree T, which
+    must hold every key of X: the search path from the root is touched,
+    then T splays."""
+    points = []
+    for t, k in enumerate(X):
+        y = T.root
+        while y is not None:
+            points.append((t, y.key))
+            if k < y.key:
+                y = y.left
+            elif k > y.key:
+                y = y.right
+            else:
+                break
+        T.splay(k)
+    return np.array(points, dtype=np.int64).reshape(-1, 2)
+
+
+@jit
+def _unsatisfied(rows, keys, n):
+    """First point j, in row order, opening an empty rectangle with the
+    last touch of rank y, as (j, y, time of y), or (-1, -1, -1)."""
+    tree, size = build(np.full(n, -1, np.int64))
+    start = 0
+    while start < len(rows):
+        end = start
+        while end < len(rows) and rows[end] == rows[start]:
+            end += 1
+        for j in range(start, end):
+            x = keys[j]
+            t = tree[x+size]
+            y = ngl(tree, size, x-1, t)
+            if y >= 0 and (j == start or y > keys[j-1]):
+                return j, y, tree[y+size]
+            y = ngr(tree, size, n, x+1, t)
+            if y < n and (j == end-1 or y < keys[j+1]):
+                return j, y, tree[y+size]
+        for j in range(start, end):
+            assign(tree, size, keys[j], rows[j])
+        start = end
+    return -1, -1, -1
+
+
+def unsatisfied(P):
+    """Two points of the (time, key) array P spanning a rectangle that
+    holds no other point, earlier first, or None if P is arborally
+    satisfied."""
+    P = np.unique(np.asarray(P).reshape(-1, 2), axis=0)
+    if not len(P):
+        return None
+    times, rows = np.unique(P[:, 0], return_inverse=True)
+    keys, ranks = np.unique(P[:, 1], return_inverse=True)
+    j, y, t = _unsatisfied(rows.ravel().astype(np.int64),
+                           ranks.ravel().astype(np.int64), len(keys))
+    if j < 0:
+        return None
+    return (times[t], keys[y]), tuple(P[j])
+
+
+def is_arborally_satisfied(P):
+    return unsatisfied(P) is None
+
+
+def benchmark(n=1000, m=20000):
+    s = [randrange(n) for _ in range(m)]
+    ts = time()
+    P = execution_points(bst.splay_execution(s))
+    tm = time()
+    assert is_arborally_satisfied(P)
+    tf = time()
+    print("%d splay accesses: %d points exported in %.3fs, checked in %.3fs"
+          % (m, len(P), tm-ts, tf-tm))
+
+
+class TestArboral(unittest.TestCase):
+
+    def _brute(self, P):
+        P = set(map(tuple, P))
+        for (t, x) in P:
+            for (u, y) in P:
+                if t < u and x != y:
+                    lo, hi = min(x, y), max(x, y)
+                    if not any(t <= v <= u and lo <= z <= hi
+                               for (v, z) in P - {(t, x), (u, y)}):
+                        return False
+        return True
+
+    def test_against_brute_force(self):
+        """Test the sweep on random small point sets."""
+        seed(20)
+        for _ in range(300):
+            P = [(randrange(5), randrange(5)) for _ in range(randrange(12))]
+            found = unsatisfied(P)
+            self.assertEqual(self._brute(P), found is None)
+            if found is not None:
+                (t, x), (u, y) = found
+                lo, hi = min(x, y), max(x, y)
+                self.assertTrue(t < u and x != y)
+                self.assertEqual({(t, x), (u, y)},
+                                 {(v, z) for (v, z) in P
+                                  if t <= v <= u and lo <= z <= hi})
+        self.assertEqual(((0, 1), (1, 2)), unsatisfied([(0, 1), (1, 2)]))
+        self.assertTrue(is_arborally_satisfied([]))
+
+    def test_executions(self):
+        """Test every execution gives a satisfied set, one point per node
+        on each search path."""
+        import geometry
+        import topdownsplay
+        seed(21)
+        s = [randrange(40) for _ in range(300)]
+        for execution, cost in ((bst.splay_execution, bst.splay_cost),
+                                (bst.mr_execution, bst.mr_cost),
+                                (geometry.GreedyExecution,
+                                 geometry.greedy_cost)):
+            P = execution_points(execution(s))
+            self.assertTrue(is_arborally_satisfied(P))
+            self.assertEqual(cost(s), len(P))
+        for optype in (pathcodes.splay, pathcodes.move_to_root,
+                       pathcodes.simple_splay, pathcodes.static):
+            self.assertTrue(is_arborally_satisfied(pathcodes_points(s,
+                                                                    optype)))
+        for kind in (topdownsplay.TDSplayTree, topdownsplay.SimpleSplayTree):
+            P = topdown_points(kind(range(40)), s)
+            self.assertTrue(is_arborally_satisfied(P))
+        # Only touching the accessed keys leaves empty rectangles
+        self.assertFalse(is_arborally_satisfied(list(enumerate(s))))
+
+
+if __name__ == '__main__':
+    benchmark()
+    unittest.main()
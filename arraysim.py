@@ -0,0 +1,482 @@
+"""Offline simulation of bottom-up splay, simple splay, move-to-root and
+static trees on typed integer arrays.
+
+Keys are mapped to their ranks 0...n-1, so node x *is* key rank x and
+searches compare plain ints. Parent, left and right pointers live in
+array("i") with -1 for null. The simulation loop is compiled with numba
+when it is installed, and runs as plain Python otherwise. Executions follow
+bst.Tree: the tree starts empty (or from a given preorder) and a key
+accessed for the first time is inserted as a leaf on its search path, so
+the per-access costs are exactly
+the len(x.path()) of bst.splay_execution and bst.mr_execution. record()
+also writes crossing, zig-zig, zig-zag and rotation counts per access into
+a NumPy array, to be analysed vectorized after the run."""
+from __future__ import print_function
+
+import unittest
+
+from array import array
+from random import randrange, seed, shuffle
+from time import time
+
+import numpy as np
+
+import bst
+from preorders import links
+
+try:
+    from numba import njit as jit
+except ImportError:
+    def jit(f):
+        return f
+
+
+SPLAY = 0
+SIMPLE_SPLAY = 1
+MOVE_TO_ROOT = 2
+STATIC = 3
+
+# Rows of the statistics written by simulate
+DEPTH = 0
+CROSSING = 1
+ZIGZIG = 2
+ZIGZAG = 3
+ROTATIONS = 4
+fields = ("depth", "crossing", "zigzig", "zigzag", "rotations")
+
+algorithms = {
+    "splay": SPLAY,
+    "simple_splay": SIMPLE_SPLAY,
+    "move_to_root": MOVE_TO_ROOT,
+    "mr": MOVE_TO_ROOT,
+    "static": STATIC,
+}
+
+
+class ArrayForest(object):
+    """Parent, left and right pointer arrays over nodes 0...n-1."""
+
+    __slots__ = ("parent", "left", "right", "root")
+
+    def __init__(F, n):
+        F.parent = array("i", [-1]) * n
+        F.left = array("i", [-1]) * n
+        F.right = array("i", [-1]) * n
+        F.root = -1
+
+    @classmethod
+    def from_preorder(cls, preorder):
+        """Build the BST with the given preorder of ranks 0...n-1."""
+        F = cls(len(preorder))
+        if len(preorder):
+            F.root = preorder[0]
+        for x, y, left in links(preorder):
+            (F.left if left else F.right)[y] = x
+            F.parent[x] = y
+        return F
+
+    def preorder(F):
+        """Return the preorder of ranks, iteratively."""
+        order = []
+        stack = [F.root] if F.root >= 0 else []
+        L, R = F.left, F.right
+        while stack:
+            x = stack.pop()
+            order.append(x)
+            if R[x] >= 0:
+                stack.append(R[x])
+            if L[x] >= 0:
+                stack.append(L[x])
+        return order
+
+
+@jit
+def _dense_ranks(a, lo, hi):
+    """Sorted keys and ranks of the integers a, all within lo...hi, by
+    counting in O(len(a) + hi - lo)."""
+    rank = np.zeros(hi - lo + 1, np.int64)
+    for k in a:
+        rank[k - lo] = 1
+    n = 0
+    for k in range(len(rank)):
+        if rank[k]:
+            rank[k] = n
+            n += 1
+        else:
+            rank[k] = -1
+    keys = np.empty(n, np.int64)
+    r = np.empty(len(a), np.int64)
+    for i in range(len(a)):
+        r[i] = rank[a[i] - lo]
+        keys[r[i]] = a[i]
+    return keys, r
+
+
+def ranks(s):
+    """Map s to ranks. Return the sorted keys and the ranked sequence as an
+    int64 array. Numeric keys are ranked by NumPy, or by counting when they
+    are integers in a range not much wider than s, and the rest (tuples
+    among them) by a dict."""
+    a = np.asarray(s)
+    numeric = a.ndim == 1 and a.dtype.kind in "iuf"
+    if numeric and a.dtype.kind != "f" and a.size:
+        lo, hi = int(a.min()), int(a.max())
+        if hi - lo < 4*a.size and hi < 2**63:
+            keys, r = _dense_ranks(a.astype(np.int64), lo, hi)
+            return keys.tolist(), r
+    if numeric:
+        keys, r = np.unique(a, return_inverse=True)
+        return keys.tolist(), r.astype(np.int64)
+    keys = sorted(set(s))
+    rank = {k: i for i, k in enumerate(keys)}
+    return keys, np.array([rank[k] for k in s], dtype=np.int64)
+
+
+@jit
+def _simulate(P, L, R, root, s, algorithm, out, dirs, path):
+    """Access ranks s in the tree rooted at root, writing per-access
+    statistics into the rows of out and returning the final root. The
+    nodes of the search path go in path and its directions in dirs, so
+    restructuring walks the path from the bottom without following parent
+    pointers, which are filled in once at the end."""
+    stats = out.shape[0] > 1
+    for i in range(len(s)):
+        x = s[i]
+        # Search, counting the depth, and insert x if absent.
+        d = 1
+        y = root
+        if y < 0:
+            root = x
+        else:
+            while True:
+                path[d-1] = y
+                if y == x:
+                    break
+                if x < y:
+                    dirs[d-1] = 0
+                    d += 1
+                    z = L[y]
+                    if z < 0:
+                        L[y] = x
+                        path[d-1] = x
+                        break
+                else:
+                    dirs[d-1] = 1
+                    d += 1
+                    z = R[y]
+                    if z < 0:
+                        R[y] = x
+                        path[d-1] = x
+                        break
+                y = z
+        out[DEPTH, i] = d
+        if stats:
+            # Crossings are x, the root and every turn in between; splay
+            # steps pair up the path from the bottom, but a simple splay
+            # zig-zag lifts x one level only, so the next step starts there.
+            c = 1 if d == 1 else 2
+            for j in range(1, d-1):
+                if dirs[j] != dirs[j-1]:
+                    c += 1
+            zz = zg = 0
+            j = d-2
+            while j >= 1:
+                if dirs[j] == dirs[j-1]:
+                    zz += 1
+                    j -= 2
+                else:
+                    zg += 1
+                    j -= 1 if algorithm == SIMPLE_SPLAY else 2
+            out[CROSSING, i] = c
+            out[ZIGZIG, i] = zz
+            out[ZIGZAG, i] = zg
+            out[ROTATIONS, i] = 0 if algorithm == STATIC else d-1
+        if algorithm == STATIC or d == 1:
+            continue
+        # Bottom-up restructuring of x = path[j]. Rotations keep the
+        # direction from each remaining ancestor to x, so dirs stays valid.
+        j = d-1
+        while j > 0:
+            y = path[j-1]
+            if j > 1 and algorithm != MOVE_TO_ROOT and \
+                    dirs[j-2] == dirs[j-1]:
+                # Zig-zig: rotate y over z, then x over y.
+                z = path[j-2]
+                if dirs[j-1] == 0:
+                    L[z] = R[y]
+                    R[y] = z
+                    L[y] = R[x]
+                    R[x] = y
+                else:
+                    R[z] = L[y]
+                    L[y] = z
+                    R[y] = L[x]
+                    L[x] = y
+                j -= 2
+            elif j > 1 and algorithm == SPLAY:
+                # Zig-zag: x takes y and z as its children.
+                z = path[j-2]
+                if dirs[j-1] == 0:
+                    L[y] = R[x]
+                    R[z] = L[x]
+                    R[x] = y
+                    L[x] = z
+                else:
+                    R[y] = L[x]
+                    L[z] = R[x]
+                    L[x] = y
+                    R[x] = z
+                j -= 2
+            else:
+                # Rotate x over its parent y.
+                if dirs[j-1] == 0:
+                    L[y] = R[x]
+                    R[x] = y
+                else:
+                    R[y] = L[x]
+                    L[x] = y
+                j -= 1
+            if j > 0:
+                if dirs[j-1] == 0:
+                    L[path[j-1]] = x
+                else:
+                    R[path[j-1]] = x
+        root = x
+    # Parent pointers of the final tree
+    if root >= 0:
+        P[root] = -1
+    for y in range(len(P)):
+        if L[y] >= 0:
+            P[L[y]] = y
+        if R[y] >= 0:
+            P[R[y]] = y
+    return root
+
+
+def simulate(F, s, algorithm=SPLAY, out=None):
+    """Access ranks s in forest F and return out, whose rows hold per-access
+    statistics: DEPTH, then CROSSING, ZIGZIG, ZIGZAG and ROTATIONS if it
+    has that many rows. By default out is a single row of depths.
+
+    Ranks not yet in the tree are inserted as leaves before adjusting."""
+    if out is None:
+        out = np.zeros((1, len(s)), dtype=np.int64)
+    F.root = _simulate(F.parent, F.left, F.right, F.root,
+                       np.asarray(s, dtype=np.int64),
+                       algorithm, out, np.zeros(len(F.parent), np.int8),
+                       np.zeros(len(F.parent), np.int32))
+    return out
+
+
+def _forest(s, initial):
+    if initial is None:
+        keys, r = ranks(s)
+        return ArrayForest(len(keys)), r
+    # Rank initial and s together; a key of s missing from initial would
+    # add a rank
+    initial = list(initial)
+    keys, r = ranks(initial + list(s))
+    if len(keys) != len(initial):
+        raise KeyError(sorted(set(keys) - set(initial))[0])
+    F = ArrayForest.from_preorder(r[:len(initial)].tolist())
+    return F, r[len(initial):]
+
+
+def costs(s, algorithm="splay", initial=None):
+    """Per-access costs of algorithm on s, starting from the empty tree or
+    from the tree with preorder initial (which must contain every key)."""
+    F, r = _forest(s, initial)
+    return simulate(F, r, algorithms[algorithm])[DEPTH]
+
+
+def record(s, algorithm="splay", initial=None, out=None):
+    """Array of every statistic in fields for each access of algorithm on
+    s, one row per statistic, written into out if given."""
+    F, r = _forest(s, initial)
+    if out is None:
+        out = np.zeros((len(fields), len(r)), dtype=np.int64)
+    return simulate(F, r, algorithms[algorithm], out)
+
+
+def splay_cost(s, initial=None):
+    return int(costs(s, "splay", initial).sum())
+
+
+def simple_splay_cost(s, initial=None):
+    return int(costs(s, "simple_splay", initial).sum())
+
+
+def mr_cost(s, initial=None):
+    return int(costs(s, "move_to_root", initial).sum())
+
+
+def static_cost(s, initial=None):
+    return int(costs(s, "static", initial).sum())
+
+
+def benchmark(n=10**4, m=10**5):
+    """Compare throughput with bst.splay_cost and bst.mr_cost."""
+    s = [randrange(n) for _ in range(m)]
+    splay_cost(list(range(10)))  # Compile outside the timings
+    for name, fast, slow in (("splay", splay_cost, bst.splay_cost),
+                             ("move-to-root", mr_cost, bst.mr_cost)):
+        ts = time()
+        a = fast(s)
+        tm = time()
+        b = slow(s)
+        tf = time()
+        assert a == b
+        print("%s: arrays %.3fs, bst %.3fs, speedup %.1fx"
+              % (name, tm-ts, tf-tm, (tf-tm)/(tm-ts)))
+
+
+def _steps(x):
+    """Count the zig-zig and zig-zag steps of splaying bst.Node x."""
+    zz = zg = 0
+    y = x.parent
+    while y is not None and y.parent is not None:
+        z = y.parent
+        if (y is z.left) == (x is y.left):
+            zz += 1
+        else:
+            zg += 1
+        x = z
+        y = x.parent
+    return zz, zg
+
+
+def _simple_splay_steps(s):
+    """(zig-zig, zig-zag, rotations) of each access of bst.Node.simple_splay,
+    counting the rotations it actually makes."""
+    counts = []
+    rotate, step = bst.Node.rotate, bst.Node._simple_splay_step
+
+    def counted_rotate(x):
+        counts[-1][2] += 1
+        rotate(x)
+
+    def counted_step(x):
+        y = x.parent
+        z = y.parent
+        if z is not None:
+            counts[-1][(y is z.left) != (x is y.left)] += 1
+        step(x)
+
+    bst.Node.rotate, bst.Node._simple_splay_step = counted_rotate, counted_step
+    try:
+        T = bst.Tree()
+        for k in s:
+            counts.append([0, 0, 0])
+            T.simple_splay(k)
+    finally:
+        bst.Node.rotate, bst.Node._simple_splay_step = rotate, step
+    return [tuple(c) for c in counts]
+
+
+class TestArraySimulation(unittest.TestCase):
+
+    def test_against_bst(self):
+        """Test per-access costs equal those of the bst executions."""
+        seed(1)
+        for n in (1, 2, 5, 40):
+            s = [randrange(n) for _ in range(300)]
+            self.assertEqual(
+                [len(x.path()) for x in bst.splay_nodes(s)],
+                list(costs(s, "splay")))
+            self.assertEqual(
+                [len(x.path()) for x in bst.mr_nodes(s)],
+                list(costs(s, "move_to_root")))
+            self.assertEqual(bst.splay_cost(s), splay_cost(s))
+            self.assertEqual(bst.mr_cost(s), mr_cost(s))
+
+    def test_simple_splay_and_static(self):
+        """Test simple splay and static trees against bst.Tree."""
+        seed(2)
+        s = [randrange(30) for _ in range(200)]
+        T = bst.Tree()
+        expected = []
+        for k in s:
+            x = T.find(k)
+            expected.append(len(x.path()))
+            x.simple_splay()
+            T.root = x
+        self.assertEqual(expected, list(costs(s, "simple_splay")))
+        T = bst.Tree()
+        expected = [len(T.find(k).path()) for k in s]
+        self.assertEqual(expected, list(costs(s, "static")))
+
+    def test_initial_tree(self):
+        """Test starting from a given preorder."""
+        seed(3)
+        keys = list(range(50))
+        shuffle(keys)
+        T = bst.Tree(keys)
+        pre = T.preorder()
+        self.assertEqual(list(pre), ArrayForest.from_preorder(pre).preorder())
+        s = [randrange(50) for _ in range(300)]
+        expected = []
+        for k in s:
+            x = T.find(k)
+            expected.append(len(x.path()))
+            x.splay()
+            T.root = x
+        self.assertEqual(expected, list(costs(s, "splay", pre)))
+
+    def test_record(self):
+        """Test every recorded statistic against the bst nodes."""
+        seed(4)
+        s = [randrange(40) for _ in range(400)]
+        for algorithm, nodes in (("splay", bst.splay_nodes),
+                                 ("move_to_root", bst.mr_nodes)):
+            expected = []
+            for x in nodes(s):
+                d = len(x.path())
+                expected.append((d, len(x.crossing_nodes())) + _steps(x) +
+                                (d-1,))
+            A = record(s, algorithm)
+            self.assertEqual((len(fields), len(s)), A.shape)
+            self.assertEqual(expected, [tuple(c) for c in A.T.tolist()])
+        out = np.zeros((len(fields), len(s)), dtype=np.int64)
+        self.assertTrue(record(s, "simple_splay", out=out) is out)
+        self.assertEqual(_simple_splay_steps(s),
+                         [tuple(c) for c in out[ZIGZIG:].T.tolist()])
+        self.assertEqual(0, record(s, "static")[ROTATIONS].sum())
+        self.assertEqual(bst.splay_crossing_cost(s),
+                         record(s)[CROSSING].sum())
+
+    def test_ranks(self):
+        """Test counting, NumPy and dict ranking agree."""
+        for s in ([5, -3, 5, 9], [10**12, 3, 10**12], [2.5, -1.0, 2.5],
+                  list("splay"), [(1, 2), (0, 5), (1, 2), (3, 0)]):
+            keys, r = ranks(s)
+            self.assertEqual(sorted(set(s)), keys)
+            self.assertEqual(s, [keys[x] for x in r])
+        self.assertEqual(([], []), tuple(map(list, ranks([]))))
+        self.assertRaises(KeyError, costs, [1, 4], "splay", [2, 1, 3])
+        # Tuple keys are ranked whole, not element by element
+        s = [(1, 2), (0, 5), (1, 2), (3, 0)]
+        self.assertEqual(bst.splay_cost(s), splay_cost(s))
+        self.assertEqual(bst.mr_cost(s), mr_cost(s))
+
+    def test_final_shape(self):
+        """Test the forest ends in the same shape as bst.Tree."""
+        s = [3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5, 8, 9, 7, 9]
+        keys, r = ranks(s)
+        F = ArrayForest(len(keys))
+        simulate(F, r, SPLAY)
+        T = bst.Tree()
+        for k in s:
+            T.splay(k)
+        self.assertEqual(T.preorder(), tuple(keys[x] for x in F.preorder()))
+        # Parents are filled in from the final child pointers
+        self.assertEqual(-1, F.parent[F.root])
+        for x in F.preorder():
+            for c in (F.left[x], F.right[x]):
+                if c >= 0:
+                    self.assertEqual(x, F.parent[c])
+        self.assertEqual([], list(costs([])))
+
+
+if __name__ == '__main__':
+    benchmark()
+    unittest.main()
@@ -0,0 +1,279 @@
+"""Splay tree whose nodes hold small sorted blocks of keys, searched with
+bisect, so that a search touches block_size times fewer nodes."""
+from __future__ import print_function
+
+import tracemalloc
+import unittest
+
+from bisect import bisect_left
+from random import randrange, seed, shuffle
+from time import time
+
+from topdownsplay import Inf, NegInf, SimpleSplayTree
+
+
+class Block(object):
+    __slots__ = ("keys", "left", "right")
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.left = None
+        self.right = None
+
+
+class BlockSplayTree(object):
+    """Set of keys kept in a simple top-down splay tree of sorted blocks."""
+
+    __slots__ = ("root", "header", "block_size", "size")
+
+    def __init__(self, iterable=None, block_size=32):
+        if block_size < 2:
+            raise ValueError("Blocks must hold at least two keys")
+        self.root = None
+        self.header = Block(None)
+        self.block_size = block_size
+        self.size = 0
+        if iterable is not None:
+            for x in iterable:
+                self.insert(x)
+
+    def __repr__(self):
+        return "%s(%s)" % (self.__class__.__name__, list(self))
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return self.root is not None
+
+    __nonzero__ = __bool__
+
+    def _splay(self, t, key):
+        """Splay the block of subtree t whose range is nearest key to the top
+        and return it. Keys below the root's block all lie before key."""
+        l = r = self.header
+        self.header.left = self.header.right = None
+        while True:
+            if key < t.keys[0]:
+                if t.left is None:
+                    break
+                if key < t.left.keys[0]:
+                    y = t.left  # Rotate right
+                    t.left = y.right
+                    y.right = t
+                    t = y
+                    if t.left is None:
+                        break
+                r.left = t  # Link right
+                r = t
+                t = t.left
+            elif key > t.keys[-1]:
+                if t.right is None:
+                    break
+                if key > t.right.keys[-1]:
+                    y = t.right  # rotate left
+                    t.right = y.left
+                    y.left = t
+                    t = y
+                    if t.right is None:
+                        break
+                l.right = t  # link left
+                l = t
+                t = t.right
+            else:
+                break
+        l.right = t.left  # assemble
+        r.left = t.right
+        t.left = self.header.right
+        t.right = self.header.left
+        return t
+
+    def splay(self, key):
+        self.root = self._splay(self.root, key)
+
+    def insert(self, key):
+        """Insert key into tree, splitting the root block if it overflows."""
+        if self.root is None:
+            self.root = Block([key])
+            self.size += 1
+            return
+        self.splay(key)
+        t = self.root
+        keys = t.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return
+        keys.insert(i, key)
+        self.size += 1
+        if len(keys) > self.block_size:
+            h = len(keys)//2
+            n = Block(keys[h:])
+            del keys[h:]
+            n.right = t.right
+            t.right = n
+
+    def remove(self, key):
+        """Remove key from the tree, merging the root block into its
+        predecessor when it runs low."""
+        if self.root is None:
+            return
+        self.splay(key)
+        t = self.root
+        keys = t.keys
+        i = bisect_left(keys, key)
+        if i == len(keys) or keys[i] != key:
+            return
+        del keys[i]
+        self.size -= 1
+        if t.left is None:
+            if not keys:
+                self.root = t.right
+            return
+        if keys and len(keys) >= max(1, self.block_size//4):
+            return
+        p = self._splay(t.left, Inf)  # Predecessor block, with no right child
+        if len(p.keys) + len(keys) <= self.block_size:
+            p.keys.extend(keys)
+            p.right = t.right
+            self.root = p
+        else:
+            t.left = p
+
+    def __contains__(self, key):
+        if self.root is None:
+            return False
+        self.splay(key)
+        keys = self.root.keys
+        i = bisect_left(keys, key)
+        return i < len(keys) and keys[i] == key
+
+    def min(self):
+        if self.root is None:
+            raise ValueError("Cannot find min() of empty tree")
+        self.splay(NegInf)
+        return self.root.keys[0]
+
+    def max(self):
+        if self.root is None:
+            raise ValueError("Cannot find max() of empty tree")
+        self.splay(Inf)
+        return self.root.keys[-1]
+
+    def blocks(self):
+        """List the blocks in symmetric order."""
+        current = self.root
+        stack = []
+        while stack or current is not None:
+            if current is not None:
+                stack.append(current)
+                current = current.left
+            else:
+                current = stack.pop()
+                yield current
+                current = current.right
+
+    def __iter__(self):
+        for b in self.blocks():
+            for k in b.keys:
+                yield k
+
+    def height(self):
+        """Number of blocks on the deepest root-to-leaf path."""
+        h = 0
+        level = [self.root] if self.root is not None else []
+        while level:
+            h += 1
+            level = [c for b in level for c in (b.left, b.right)
+                     if c is not None]
+        return h
+
+
+# Benchmarks
+
+def _measure(make, keys, lookups):
+    """Return construction and lookup time, and memory held by the tree."""
+    tracemalloc.start()
+    ts = time()
+    T = make(keys)
+    tm = time()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    for k in lookups:
+        k in T
+    tf = time()
+    return T, tm-ts, tf-tm, memory
+
+
+def benchmark(n=100000, m=200000, block_size=32):
+    """Compare throughput and memory of BlockSplayTree and SimpleSplayTree."""
+    keys = list(range(n))
+    shuffle(keys)
+    lookups = [randrange(n) for _ in range(m)]
+    B, b_build, b_look, b_mem = _measure(
+        lambda k: BlockSplayTree(k, block_size), keys, lookups)
+    S, s_build, s_look, s_mem = _measure(SimpleSplayTree, keys, lookups)
+    print("BlockSplayTree: build %.3fs, lookup %.3fs, %d bytes, "
+          "%d blocks, height %d" % (b_build, b_look, b_mem,
+                                    sum(1 for _ in B.blocks()), B.height()))
+    print("SimpleSplayTree: build %.3fs, lookup %.3fs, %d bytes"
+          % (s_build, s_look, s_mem))
+
+
+class TestBlockSplay(unittest.TestCase):
+
+    def test_against_set(self):
+        """Test random inserts, removes and lookups agree with a set."""
+        seed(11)
+        for block_size in (2, 3, 8, 32):
+            T = BlockSplayTree(block_size=block_size)
+            s = set()
+            for _ in range(3000):
+                k = randrange(500)
+                op = randrange(3)
+                if op == 0:
+                    T.insert(k)
+                    s.add(k)
+                elif op == 1:
+                    T.remove(k)
+                    s.discard(k)
+                else:
+                    self.assertEqual(k in s, k in T)
+                self.assertEqual(len(s), len(T))
+            self.assertEqual(sorted(s), list(T))
+            for b in T.blocks():
+                self.assertTrue(0 < len(b.keys) <= block_size)
+
+    def test_fewer_blocks(self):
+        """Test the tree uses far fewer, and shallower, nodes than keys."""
+        T = BlockSplayTree(range(1000), block_size=16)
+        self.assertEqual(list(range(1000)), list(T))
+        self.assertTrue(sum(1 for _ in T.blocks()) <= 1000//8)
+        self.assertEqual(0, T.min())
+        self.assertEqual(999, T.max())
+
+    def test_remove_everything(self):
+        """Test the tree empties cleanly."""
+        keys = list(range(200))
+        T = BlockSplayTree(keys, block_size=4)
+        shuffle(keys)
+        for k in keys:
+            T.remove(k)
+        self.assertFalse(T)
+        self.assertEqual(0, len(T))
+        self.assertNotIn(3, T)
+        with self.assertRaises(ValueError):
+            T.min()
+        with self.assertRaises(ValueError):
+            BlockSplayTree(block_size=1)
+
+    def test_splay_to_block(self):
+        """Test the block holding an accessed key becomes the root."""
+        T = BlockSplayTree(range(100), block_size=4)
+        for k in (57, 3, 98, 41):
+            self.assertIn(k, T)
+            self.assertIn(k, T.root.keys)
+
+
+if __name__ == '__main__':
+    benchmark()
+    unittest.main()
@@ -5,6 +5,8 @@ import random
 import unittest
 
 from bst import *
+from depthmaps import DepthMaps, MaxIndex
+from journal import ForkableTree
 
 # Pretty Printing
 
@@ -48,8 +50,10 @@ def compare_paths(x, y, prefix=""):
     print()
 
 
-def break_wilber(k, e):
-    """Try to break Wilber starting with sequential access on 2**k-1 nodes."""
+def break_wilber(k, e, verbose=True):
+    """Try to break Wilber starting with sequential access on 2**k-1 nodes.
+    Each access goes to the key with largest splay depth less move-to-root
+    levels, tracked by depthmaps under rotation. Return the sequence."""
     n = 2**k-1
     s = list(range(1, n+1))
     m = 1
@@ -57,18 +61,71 @@ def break_wilber(k, e):
         s.append(m)
         m *= 2
     (M, _), (S, _) = last(dual_execution(s))
+    DM = DepthMaps(M.root.inorder_nodes())
+    DS = DepthMaps(S.root.inorder_nodes())
+    # Depth and levels count from 1, and levels is one more than the
+    # zig-zag depth, so d - l is depth less zig-zag depth
+    index = MaxIndex((DS, (1, 0, 0)), (DM, (0, 0, -1)))
     for i in range(e):
-        d = S.depths()
-        l = M.levels()
-        ratios = {i: d[i] - l[i] for i in range(1, n+1)}
-        k = max(ratios, key=ratios.__getitem__)
+        k = DS.nodes[index.best()[1]].key
         s.append(k)
         x = M.find(k)
         y = S.find(k)
-        compare_paths(x, y, str(i) + ":")
-        M.move_to_root(k)
-        S.splay(k)
-    compare_costs(s)
+        if verbose:
+            compare_paths(x, y, str(i) + ":")
+        M.root = DM.move_to_root(x)
+        S.root = DS.splay(y)
+    if verbose:
+        compare_costs(s)
+    return s
+
+
+def _gain(M, S, k):
+    """Splay path length less move-to-root crossings for accessing k."""
+    return len(S.find(k).path()) - len(M.find(k).crossing_nodes())
+
+
+def lookahead(M, S, keys, depth=2):
+    """Return the key of keys starting the run of depth accesses with the
+    largest total gain, and that gain. Each candidate is tried on forks of
+    the move-to-root tree M and splay tree S, so both end unchanged."""
+    best = (None, None)
+    for k in keys:
+        g = _gain(M, S, k)
+        if depth > 1:
+            with M.fork(), S.fork():
+                M.move_to_root(k)
+                S.splay(k)
+                g += lookahead(M, S, keys, depth-1)[1]
+        if best[1] is None or g > best[1]:
+            best = (k, g)
+    return best
+
+
+def break_wilber_lookahead(k, e, depth=2):
+    """As break_wilber, but pick each key by looking depth accesses ahead."""
+    n = 2**k-1
+    s = list(range(1, n+1))
+    m = 1
+    while m < n:
+        s.append(m)
+        m *= 2
+    M = ForkableTree()
+    S = ForkableTree()
+    for j in s:
+        M.move_to_root(j)
+        S.splay(j)
+    M.commit()
+    S.commit()
+    keys = range(1, n+1)
+    for i in range(e):
+        j, _ = lookahead(M, S, keys, depth)
+        s.append(j)
+        M.move_to_root(j)
+        S.splay(j)
+        M.commit()
+        S.commit()
+    return s
 
 
 from random import shuffle
@@ -82,6 +139,46 @@ def randperm_compare(n):
     shuffle(s)
     
 
+class TestLookahead(unittest.TestCase):
+
+    def test_lookahead(self):
+        """Test lookahead leaves the trees alone and scores correctly."""
+        s = [4, 2, 6, 1, 3, 5, 7, 1]
+        M = ForkableTree()
+        S = ForkableTree()
+        for j in s:
+            M.move_to_root(j)
+            S.splay(j)
+        shapes = (M.preorder(), S.preorder())
+        k, g = lookahead(M, S, range(1, 8), 1)
+        self.assertEqual(shapes, (M.preorder(), S.preorder()))
+        self.assertEqual(max(_gain(M, S, j) for j in range(1, 8)), g)
+        k, g = lookahead(M, S, range(1, 8), 2)
+        self.assertEqual(shapes, (M.preorder(), S.preorder()))
+        t = s + [k]
+        self.assertEqual(g - _gain(M, S, k), max(
+            (splay_cost(t + [j]) - splay_cost(t)) -
+            (mr_crossing_cost(t + [j]) - mr_crossing_cost(t))
+            for j in range(1, 8)))
+        self.assertEqual(11, len(break_wilber_lookahead(3, 1)))
+
+    def test_break_wilber(self):
+        """Test each access goes where recomputed depths and levels say."""
+        s = break_wilber(4, 30, verbose=False)
+        M = Tree()
+        S = Tree()
+        for i, k in enumerate(s):
+            if i == 18:
+                continue  # Never applied, as dual_execution stops before it
+            if i > 18:
+                d = S.depths()
+                l = M.levels()
+                self.assertEqual(k, max(range(1, 16),
+                                        key=lambda j: d[j] - l[j]))
+            M.move_to_root(k)
+            S.splay(k)
+
+
 if __name__ == '__main__':
     break_wilber(8, 1000)
     from random import randint, shuffle
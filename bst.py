@@ -4,8 +4,11 @@ tree."""
 import functools
 import unittest
 
+from snapshot import Snapshot
+
 __all__ = [
     "Node",
+    "Snapshot",
     "Tree",
     "mr_execution", "splay_execution", "dual_execution",
     "mr_nodes", "splay_nodes", "dual_nodes",
@@ -13,6 +16,7 @@ __all__ = [
     "mr_cost", "mr_crossing_cost", "mr_inside_cost", "mr_critical_cost",
     "splay_cost", "splay_crossing_cost", "splay_inside_cost",
     "splay_critical_cost",
+    "costs",
     "last"
 ]
 
@@ -27,29 +31,17 @@ def maker(maptype):
     return outputter
 
 
-class Placeholder(object):
-    """Slot for a null node, allowing them to be linked together."""
-
-    __slots__ = ("parent_init")
-
-    def __init__(p):
-        p.parent_init = None
-
-
 @functools.total_ordering
 class Node(object):
     """Node object maintaining all properties under rotation."""
 
-    __slots__ = ("parent", "left", "right", "key",
-                 "parent_init", "left_init", "right_init")
+    __slots__ = ("parent", "left", "right", "key", "initial")
 
     def __init__(x, key):
         assert not is_node(key)
         x.key = key
-        x.parent = x.parent_init = None
-        x.left = x.left_init = Placeholder()
-        x.right = x.right_init = Placeholder()
-        x.left.parent_init = x.right.parent_init = x
+        x.parent = x.left = x.right = None
+        x.initial = None  # Snapshot of the initial tree, made on first insert
 
     def __repr__(x):
         return "%s(%r)" % (x.__class__.__name__, x.key)
@@ -76,32 +68,12 @@ class Node(object):
     def insert_left(x, k):
         """Insert a node to the left of x."""
         assert not is_node(x.left)
-        p = x.left
-        x_init = p.parent_init
-        y = Node(k)
-        y.parent_init = x_init
-        if p is x_init.left_init:
-            x_init.left_init = y
-        else:
-            x_init.right_init = y
-        x.left = y
-        y.parent = x
-        return y
+        return x._initial().attach(x, Node(k), True)
 
     def insert_right(x, k):
         """Insert new node with key k to the right of x."""
         assert not is_node(x.right)
-        p = x.right
-        x_init = p.parent_init
-        y = Node(k)
-        y.parent_init = x_init
-        if p is x_init.left_init:
-            x_init.left_init = y
-        else:
-            x_init.right_init = y
-        x.right = y
-        y.parent = x
-        return y
+        return x._initial().attach(x, Node(k), False)
 
     def rotate(x):
         """Rotate the edge between x and its parent."""
@@ -143,14 +115,21 @@ class Node(object):
             y.left = x
             x.parent = y
 
+    def _initial(x):
+        if x.initial is None:
+            x.initial = Snapshot(x)
+        return x.initial
+
     def reset(x):
         """Reset the tree containing x to its initial state."""
-        r = x.root()
-        for node in r.inorder_nodes():
-            node.parent = node.parent_init
-            node.left = node.left_init
-            node.right = node.right_init
-        return r.root()
+        if x.initial is None:
+            return x
+        return x.initial.restore()
+
+    def snapshot(x):
+        """Record the current shape of x's tree. Calling restore() on the
+        result puts it back, with nodes inserted since in their gaps."""
+        return Snapshot(x.root(), x._initial().family)
 
     # The various walks
 
@@ -308,6 +287,26 @@ class Node(object):
             if y is not None:
                 yield y
 
+    def path_counts(x):
+        """Return the lengths of x's path, crossing nodes, inside nodes and
+        critical subpath, in one walk up the tree and without building
+        them."""
+        d = c = 1
+        adjacent = 0  # Crossing nodes whose predecessor is their child
+        last = x  # Last crossing node
+        y = x.parent
+        while y is not None:
+            d += 1
+            z = y.parent
+            if z is None or (y is z.left) != (x is y.left):
+                c += 1
+                if last is x:
+                    adjacent += 1
+                last = y
+            x = y
+            y = z
+        return (d, c, c-1, 2*c-1-adjacent)
+
     def crossing_split(x):
         """Split crossing nodes into left, right and center."""
         c = x.crossing_nodes()
@@ -509,6 +508,15 @@ class Tree(object):
         if T:
             T.root = T.root.reset()
 
+    def snapshot(T):
+        """Record the current shape of T, or None if T is empty."""
+        return T.root.snapshot() if T else None
+
+    def restore(T, snapshot):
+        """Return T to the shape recorded by snapshot()."""
+        if snapshot is not None:
+            T.root = snapshot.restore()
+
     def checkpoint(T):
         """Create new copy of T in current shape."""
         T = Tree(T.preorder())
@@ -632,6 +640,48 @@ def splay_critical_cost(s):
     return sum(len(x.critical_subpath()) for x in splay_nodes(s))
 
 
+metrics = ("path", "crossing", "inside", "critical", "rotations")
+
+
+def costs(s, which=metrics, algorithms=("mr", "splay")):
+    """Return {algorithm: {metric: total}} for move-to-root ("mr") and
+    splay executions of s, replayed together in a single pass."""
+    which = tuple(which)
+    for m in which:
+        if m not in metrics:
+            raise ValueError("Unknown metric %r" % m)
+    trees = []
+    for a in algorithms:
+        if a == "mr":
+            trees.append((a, Tree(), Node.move_to_root))
+        elif a == "splay":
+            trees.append((a, Tree(), Node.splay))
+        else:
+            raise ValueError("Unknown algorithm %r" % a)
+    totals = [[0]*5 for _ in trees]
+    walk = bool(set(which) & {"crossing", "inside", "critical"})
+    for k in s:
+        for (_, T, adjust), t in zip(trees, totals):
+            x = T.find(k)
+            if walk:
+                d, c, i, r = x.path_counts()
+                t[1] += c
+                t[2] += i
+                t[3] += r
+            else:
+                d = 1
+                y = x.parent
+                while y is not None:
+                    d += 1
+                    y = y.parent
+            t[0] += d
+            t[4] += d - 1
+            adjust(x)
+            T.root = x
+    return {a: {m: t[metrics.index(m)] for m in which}
+            for (a, _, _), t in zip(trees, totals)}
+
+
 def last(iterable):
     """Return the last element of an iterable."""
     for x in iterable:
@@ -952,6 +1002,31 @@ class TestTree(unittest.TestCase):
         self.assertEqual("abcefghkm", "".join(T.inorder()))
         self.assertEqual("kgcabefhm", "".join(T.preorder()))
 
+    def test_snapshot(self):
+        """Test a snapshot taken mid-run restores, with later inserts."""
+        from random import randrange, seed
+        seed(5)
+        s = [randrange(100) for _ in range(30)]
+        T = Tree(s)
+        s = list(first_appearances(s))
+        for _ in range(50):
+            k = randrange(150)
+            s.append(k)
+            T.splay(k)
+        S = T.snapshot()
+        shape = T.preorder()
+        t = [randrange(200) for _ in range(50)]
+        for k in t:
+            T.move_to_root(k)
+        T.restore(S)
+        self.assertEqual(Tree(shape + tuple(t)).preorder(), T.preorder())
+        T.reset()
+        self.assertEqual(Tree(s + t).preorder(), T.preorder())
+        T.restore(S)
+        T.restore(S)
+        self.assertEqual(Tree(shape + tuple(t)).preorder(), T.preorder())
+        self.assertEqual(None, Tree().snapshot())
+
     def test_checkpoint(self):
         """Test tree is copied in the appropriate state."""
         T = Tree("kgcabhemkf")
@@ -1057,6 +1132,35 @@ class TestWilber(unittest.TestCase):
         self.assertEqual(v, x.inside_nodes())
         self.assertEqual(37, wilber2(s))
 
+    def test_path_counts(self):
+        """Test counts agree with the lengths of the built paths."""
+        for e in ("rrrllrlrrllrlr", "lllrrr", "llrlrrll", "lrlrlr", "r"):
+            x = _new_path(e)
+            self.assertEqual(
+                (len(x.path()), len(x.crossing_nodes()),
+                 len(x.inside_nodes()), len(x.critical_subpath())),
+                x.path_counts())
+        self.assertEqual((1, 1, 0, 1), Node(None).path_counts())
+
+    def test_costs(self):
+        """Test the single-pass costs match the separate replays."""
+        s = list("aihjgfclkendbpmoi") + list(range(10))
+        s = [str(k) for k in s]
+        c = costs(s)
+        self.assertEqual(mr_cost(s), c["mr"]["path"])
+        self.assertEqual(mr_crossing_cost(s), c["mr"]["crossing"])
+        self.assertEqual(mr_inside_cost(s), c["mr"]["inside"])
+        self.assertEqual(mr_critical_cost(s), c["mr"]["critical"])
+        self.assertEqual(splay_cost(s), c["splay"]["path"])
+        self.assertEqual(splay_crossing_cost(s), c["splay"]["crossing"])
+        self.assertEqual(splay_inside_cost(s), c["splay"]["inside"])
+        self.assertEqual(splay_critical_cost(s), c["splay"]["critical"])
+        self.assertEqual(splay_cost(s) - len(s), c["splay"]["rotations"])
+        self.assertEqual({"splay": {"path": splay_cost(s)}},
+                         costs(s, ["path"], ["splay"]))
+        with self.assertRaises(ValueError):
+            costs(s, ["depth"])
+
     def compare_to_wilber2(self):
         """Compare paths and counts to wilber2 exactly."""
         s = list("aihjgfclkendbpmoi")
@@ -1,6 +1,8 @@
 from bst import *
 from random import shuffle
 
+from arraysim import CROSSING, record
+
 
 def subseq_compare(x, k=20):
     y = x[:]
@@ -15,20 +17,33 @@ def subseq_compare(x, k=20):
         print(x_el.crossing_nodes(), y_el.crossing_nodes())
 
 
+def crossing_costs(s):
+    """Return splay and move-to-root crossing costs of s."""
+    return (int(record(s, "splay")[CROSSING].sum()),
+            int(record(s, "move_to_root")[CROSSING].sum()))
+
+
 def small_counter_ex(n=4):
     r = list(range(n))
     shuffle(r)
-    c_splay = splay_crossing_cost(r)
-    c_mr = mr_crossing_cost(r)
+    c_splay, c_mr = crossing_costs(r)
     while c_splay >= c_mr:
         print(c_splay - c_mr)
         shuffle(r)
-        c_splay = splay_crossing_cost(r)
-        c_mr = mr_crossing_cost(r)
+        c_splay, c_mr = crossing_costs(r)
     print(c_splay - c_mr)
     print(r)
 
 
+def deletion_gaps(x, algorithm="splay"):
+    """Return crossing cost of x less that of x with item i deleted, for
+    every i, comparing per-access crossings as arrays."""
+    cx = record(x, algorithm)[CROSSING]
+    total = cx.sum()
+    return [int(total - record(x[:i] + x[i+1:], algorithm)[CROSSING].sum())
+            for i in range(len(x))]
+
+
 def break_splay_crossing_subseq(n=5):
     r = list(range(n))
     while True:
@@ -38,8 +53,8 @@ def break_splay_crossing_subseq(n=5):
         X = r + t
         t.pop(0)
         Y = r + t
-        c_x = splay_crossing_cost(X)
-        c_y = splay_crossing_cost(Y)
+        c_x = record(X)[CROSSING].sum()
+        c_y = record(Y)[CROSSING].sum()
         print(c_x - c_y)
         if c_x < c_y:
             break
@@ -53,11 +68,6 @@ if __name__ == '__main__':
     # subseq_compare(r)
     # x = list(range(1000))
     # shuffle(x)
-    # cx = splay_crossing_cost(x)
-    # for i in range(1000):
-    #     y = x[:]
-    #     y.pop(i)
-    #     cy = splay_crossing_cost(y)
-    #     print(cx, cy, cx - cy)
+    # print(deletion_gaps(x))
     # small_counter_ex()
     break_splay_crossing_subseq()
\ No newline at end of file
@@ -0,0 +1,258 @@
+"""Cost change of deleting each single access from a sequence.
+
+Deleting s[i] leaves the run unchanged up to access i, so the engine
+steps one base tree through s and, for each i, copies the state before
+access i and replays only the suffix from i+1. Once the perturbed tree
+falls back into the same shape as the unperturbed one, the two runs cost
+the same from then on, so the replay stops.
+Convergence is exact shape equality, so a difference left in a part of
+the tree that is rarely touched again keeps the replay going to the end:
+permutations converge often, long random sequences seldom.
+
+Shapes are compared by a Zobrist-style hash over (node, parent) pairs and
+the root, which each rotation updates in O(1). The base run records the
+hash after every access. A matching hash is confirmed against the
+unperturbed tree, caught up by replaying the same accesses from a copy,
+so a collision costs time but never a wrong delta."""
+from __future__ import print_function
+
+import unittest
+
+from random import getrandbits, randrange, seed, shuffle
+from time import time
+
+import arraysim
+
+MASK = (1 << 64) - 1
+
+
+class HashedTree(object):
+    """Parent, left and right lists over ranks 0...n-1, with -1 for null,
+    and a hash of the shape kept up to date under rotation."""
+
+    __slots__ = ("parent", "left", "right", "root", "hash", "A", "B", "C")
+
+    def __init__(T, n, A=None, B=None, C=None):
+        T.parent = [-1]*n
+        T.left = [-1]*n
+        T.right = [-1]*n
+        T.root = -1
+        # Random odd multipliers; a pair (x, p) hashes to A[x]*B[p+1]
+        T.A = A or [getrandbits(64) | 1 for _ in range(n)]
+        T.B = B or [getrandbits(64) | 1 for _ in range(n+1)]
+        T.C = C or [getrandbits(64) for _ in range(n)]
+        T.hash = 0
+        for x in range(n):
+            T.hash ^= (T.A[x] * T.B[0]) & MASK
+
+    def copy(T):
+        Q = HashedTree.__new__(HashedTree)
+        Q.parent = T.parent[:]
+        Q.left = T.left[:]
+        Q.right = T.right[:]
+        Q.root = T.root
+        Q.hash = T.hash
+        Q.A, Q.B, Q.C = T.A, T.B, T.C
+        return Q
+
+    def _set_parent(T, x, p):
+        A, B = T.A, T.B
+        T.hash ^= ((A[x] * B[T.parent[x]+1]) ^ (A[x] * B[p+1])) & MASK
+        T.parent[x] = p
+
+    def _set_root(T, x):
+        C = T.C
+        if T.root >= 0:
+            T.hash ^= C[T.root]
+        T.hash ^= C[x]
+        T.root = x
+
+    def _rotate(T, x):
+        P, L, R = T.parent, T.left, T.right
+        y = P[x]
+        z = P[y]
+        if L[y] == x:
+            b = R[x]
+            L[y] = b
+            R[x] = y
+        else:
+            b = L[x]
+            R[y] = b
+            L[x] = y
+        if b >= 0:
+            T._set_parent(b, y)
+        T._set_parent(y, x)
+        T._set_parent(x, z)
+        if z < 0:
+            T._set_root(x)
+        elif L[z] == y:
+            L[z] = x
+        else:
+            R[z] = x
+
+    def access(T, x, algorithm=arraysim.SPLAY):
+        """Search for x, inserting it as a leaf if absent, adjust, and
+        return the number of nodes on the search path."""
+        P, L, R = T.parent, T.left, T.right
+        y = T.root
+        d = 1
+        if y < 0:
+            T._set_root(x)
+            return d
+        while y != x:
+            d += 1
+            if x < y:
+                if L[y] < 0:
+                    L[y] = x
+                    T._set_parent(x, y)
+                    break
+                y = L[y]
+            else:
+                if R[y] < 0:
+                    R[y] = x
+                    T._set_parent(x, y)
+                    break
+                y = R[y]
+        if algorithm == arraysim.STATIC:
+            return d
+        while P[x] >= 0:
+            y = P[x]
+            z = P[y]
+            if z >= 0 and algorithm != arraysim.MOVE_TO_ROOT:
+                if (L[z] == y) == (L[y] == x):
+                    T._rotate(y)
+                elif algorithm == arraysim.SPLAY:
+                    T._rotate(x)
+            T._rotate(x)
+        return d
+
+
+def deletion_deltas(s, initial=(), algorithm="splay", indices=None):
+    """Return d where d[i] is the cost of s with s[i] deleted less the cost
+    of s, for each i of indices (every i by default). The tree starts from
+    the keys of initial inserted in order into an unbalanced BST (so a
+    preorder gives that tree), and grows by inserting any other key as a
+    leaf when it is first accessed."""
+    algorithm = arraysim.algorithms[algorithm]
+    s = list(s)
+    keys = sorted(set(initial) | set(s))
+    rank = {k: i for i, k in enumerate(keys)}
+    s = [rank[k] for k in s]
+    m = len(s)
+    base = HashedTree(len(keys))
+    for k in initial:
+        base.access(rank[k], arraysim.STATIC)
+    # Unperturbed costs, and hashes before and after every access
+    run = base.copy()
+    costs = []
+    hashes = [run.hash]
+    for x in s:
+        costs.append(run.access(x, algorithm))
+        hashes.append(run.hash)
+    deltas = []
+    wanted = set(range(m) if indices is None else indices)
+    for i in range(m):
+        if i not in wanted:
+            base.access(s[i], algorithm)
+            continue
+        delta = -costs[i]
+        T = base.copy()
+        base.access(s[i], algorithm)
+        if hashes[i] != hashes[i+1] or not _same_shape(T, base):
+            U = None  # The unperturbed run, caught up to confirm a match
+            for j in range(i+1, m):
+                delta += T.access(s[j], algorithm) - costs[j]
+                if T.hash == hashes[j+1]:
+                    if U is None:
+                        U, k = base.copy(), i+1
+                    while k <= j:
+                        U.access(s[k], algorithm)
+                        k += 1
+                    if _same_shape(T, U):
+                        break
+        deltas.append(delta)
+    return deltas
+
+
+def _same_shape(T, U):
+    return T.root == U.root and T.parent == U.parent
+
+
+def _brute(s, initial=(), algorithm="splay"):
+    """Deltas by re-simulating every deleted sequence in full."""
+    s = list(s)
+
+    def cost(t):
+        keys = sorted(set(initial) | set(s))
+        rank = {k: i for i, k in enumerate(keys)}
+        T = HashedTree(len(keys))
+        for k in initial:
+            T.access(rank[k], arraysim.STATIC)
+        return sum(T.access(rank[k], arraysim.algorithms[algorithm])
+                   for k in t)
+
+    c = cost(s)
+    return [cost(s[:i] + s[i+1:]) - c for i in range(len(s))]
+
+
+def benchmark(n=300):
+    a = list(range(n))
+    shuffle(a)
+    ts = time()
+    deltas = deletion_deltas(a, a)
+    tm = time()
+    _brute(a, a)
+    tf = time()
+    print("%d deletions: incremental %.3fs, full replays %.3fs; "
+          "largest increase %d" % (n, tm-ts, tf-tm, max(deltas)))
+
+
+class TestDeletions(unittest.TestCase):
+
+    def test_against_full_replay(self):
+        """Test every delta against re-simulating the shortened sequence."""
+        seed(8)
+        for algorithm in ("splay", "move_to_root", "simple_splay", "static"):
+            s = [randrange(25) for _ in range(150)]
+            initial = list(range(0, 25, 2))
+            shuffle(initial)
+            self.assertEqual(_brute(s, initial, algorithm),
+                             deletion_deltas(s, initial, algorithm))
+            self.assertEqual(_brute(s, (), algorithm),
+                             deletion_deltas(s, (), algorithm))
+
+    def test_hash_collisions(self):
+        """Test deltas stay exact when every shape hashes alike."""
+        import deletions
+        seed(9)
+        s = [randrange(12) for _ in range(60)]
+        expected = _brute(s, list(range(12)))
+        deletions.getrandbits = lambda k: 0
+        try:
+            self.assertEqual(expected, deletion_deltas(s, list(range(12))))
+        finally:
+            deletions.getrandbits = getrandbits
+
+    def test_noted_permutation(self):
+        """Test the noted permutation: deleting its 21st access raises the
+        splay cost by 46."""
+        from noted_list import perm
+        self.assertEqual([46], deletion_deltas(perm, perm, indices=[20]))
+
+    def test_hash_tracks_shape(self):
+        """Test the maintained hash equals one computed from scratch."""
+        T = HashedTree(10)
+        for x in (3, 7, 1, 9, 4, 3, 0, 8):
+            T.access(x)
+        Q = HashedTree(10, T.A, T.B, T.C)
+        for x in range(10):
+            if T.parent[x] >= 0:
+                Q._set_parent(x, T.parent[x])
+        Q._set_root(T.root)
+        self.assertEqual(T.hash, Q.hash)
+        self.assertEqual([], deletion_deltas([]))
+
+
+if __name__ == '__main__':
+    benchmark()
+    unittest.main()
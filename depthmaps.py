@@ -0,0 +1,389 @@
+"""Depth, zig-zig depth and zig-zag depth of every node, kept under rotation.
+
+zigzig's depths, zigzig_depths and zagzig_depths, and bst's depths and
+levels (one more than the depth and the zig-zag depth), walk the whole
+tree each time. DepthMaps instead adjusts the tree itself, and a rotation
+only recomputes the two rotated nodes, their children and grandchildren.
+Everything further down moves with the subtree of a grandchild, and a
+subtree is a range of inorder ranks, so those shifts are lazy range
+additions to a Fenwick tree, and reading a node back costs O(log n).
+
+Every range addition is passed on to listeners. RatioIndex uses them to
+keep the node of largest zig-zig to zig-zag ratio, and MaxIndex the node
+maximizing a weighted sum of the maps of one or more trees."""
+from __future__ import print_function
+
+import operator
+import unittest
+
+from random import randrange, seed
+from time import time
+
+import bst
+from fenwick import Fenwick
+
+
+def _plus(u, v):
+    return tuple(map(operator.add, u, v))
+
+
+class _Differences(Fenwick):
+    """Vector values kept as differences of consecutive positions: adding
+    to a range is two adds, and reading a position is a prefix sum."""
+
+    __slots__ = ()
+
+    def __init__(F, values):
+        zero = (0,)*len(values[0]) if values else ()
+        diffs = [tuple(a - b for a, b in zip(v, u))
+                 for u, v in zip([zero] + values, values)]
+        super(_Differences, F).__init__(len(values), _plus, zero, diffs)
+
+    def add_range(F, lo, hi, delta):
+        """Add delta to every position lo...hi."""
+        F.add(lo, delta)
+        F.add(hi+1, tuple(-d for d in delta))
+
+    __getitem__ = Fenwick.prefix
+
+
+def _below(v, c):
+    """Values of c given the values v of its parent."""
+    p = c.parent
+    g = p.parent
+    if g is None:
+        return (v[0]+1, 0, 0)
+    elif (c is p.left) == (p is g.left):
+        return (v[0]+1, v[1]+1, v[2])
+    else:
+        return (v[0]+1, v[1], v[2]+1)
+
+
+def _children(x):
+    return [c for c in (x.left, x.right) if c is not None]
+
+
+class DepthMaps(object):
+    """(depth, zig-zig depth, zig-zag depth) of each node of a tree, with the
+    root at (0, 0, 0), as in zigzig. Adjust the tree only through the
+    rotate, splay, simple_splay and move_to_root methods here. Works with
+    bst.Node and pathcodes.Node alike."""
+
+    __slots__ = ("nodes", "rank", "lo", "hi", "values", "listeners")
+
+    def __init__(D, nodes):
+        """Maps for the tree on nodes, given in inorder."""
+        D.nodes = list(nodes)
+        D.rank = {id(x): i for i, x in enumerate(D.nodes)}
+        D.listeners = []
+        n = len(D.nodes)
+        D.lo = list(range(n))
+        D.hi = list(range(n))
+        values = [None]*n
+        order = []
+        if n:
+            r = D.nodes[0]
+            while r.parent is not None:
+                r = r.parent
+            values[D.rank[id(r)]] = (0, 0, 0)
+            stack = [r]
+            while stack:
+                x = stack.pop()
+                order.append(x)
+                for c in _children(x):
+                    values[D.rank[id(c)]] = _below(values[D.rank[id(x)]], c)
+                    stack.append(c)
+        for x in reversed(order):
+            D._span(x)
+        D.values = _Differences(values)
+
+    def __len__(D):
+        return len(D.nodes)
+
+    def _span(D, x):
+        """Recompute the range of ranks under x from its children."""
+        i = D.rank[id(x)]
+        D.lo[i] = D.lo[D.rank[id(x.left)]] if x.left is not None else i
+        D.hi[i] = D.hi[D.rank[id(x.right)]] if x.right is not None else i
+
+    def value(D, x):
+        """(depth, zig-zig depth, zig-zag depth) of node x."""
+        return D.values[D.rank[id(x)]]
+
+    def _add(D, lo, hi, delta):
+        if any(delta):
+            D.values.add_range(lo, hi, delta)
+            for f in D.listeners:
+                f(lo, hi, delta)
+
+    def rotate(D, x):
+        """Rotate the edge between x and its parent."""
+        y = x.parent
+        z = y.parent
+        rank, values = D.rank, D.values
+        # Nodes whose values are recomputed, then subtrees that just shift
+        top = [x, y] + [c for c in _children(x) + _children(y) if c is not y
+                        and c is not x]
+        subtrees = [c for r in top[2:] for c in _children(r)]
+        old = [values[rank[id(r)]] for r in top + subtrees]
+        x.rotate()
+        D._span(y)
+        D._span(x)
+        new = {}
+        if z is not None:
+            new[id(z)] = values[rank[id(z)]]
+        for r in top + subtrees:
+            p = r.parent
+            new[id(r)] = _below(new[id(p)], r) if p is not None else (0, 0, 0)
+        for j, (r, v) in enumerate(zip(top + subtrees, old)):
+            i = rank[id(r)]
+            delta = [a-b for a, b in zip(new[id(r)], v)]
+            if j < len(top):
+                D._add(i, i, delta)
+            else:
+                D._add(D.lo[i], D.hi[i], delta)
+
+    def splay(D, x):
+        while x.parent is not None:
+            y = x.parent
+            z = y.parent
+            if z is not None:
+                if (y is z.left) == (x is y.left):
+                    D.rotate(y)  # zig-zig
+                else:
+                    D.rotate(x)  # zig-zag
+            D.rotate(x)
+        return x
+
+    def simple_splay(D, x):
+        while x.parent is not None:
+            y = x.parent
+            z = y.parent
+            if z is not None and (y is z.left) == (x is y.left):
+                D.rotate(y)
+            D.rotate(x)
+        return x
+
+    def move_to_root(D, x):
+        while x.parent is not None:
+            D.rotate(x)
+        return x
+
+
+class _Index(object):
+    """Segment tree over ranks with lazy range addition of tuples. Each
+    segment keeps an aggregate of its positions less the pending additions
+    of itself and its ancestors; subclasses say how to shift and merge
+    aggregates. Additions are collected until the next query, when those
+    that cancel out (as most do over one splay) are dropped."""
+
+    def __init__(I, leaves):
+        I.n = len(leaves)
+        I.agg = [None]*(4*I.n)
+        I.lazy = [None]*(4*I.n)
+        I.pending = {}
+        if I.n:
+            I._build(1, 0, I.n-1, leaves)
+
+    def _build(I, s, l, r, leaves):
+        if l == r:
+            I.agg[s] = leaves[l]
+        else:
+            m = (l+r) // 2
+            I._build(2*s, l, m, leaves)
+            I._build(2*s+1, m+1, r, leaves)
+            I._pull(s)
+
+    def _pull(I, s):
+        I.agg[s] = I.merge(I.shift(I.agg[2*s], I.lazy[2*s]),
+                           I.shift(I.agg[2*s+1], I.lazy[2*s+1]))
+
+    @staticmethod
+    def _combine(a, b):
+        return tuple(b) if a is None else tuple(p+q for p, q in zip(a, b))
+
+    def add(I, lo, hi, delta):
+        """Add delta to the positions lo...hi."""
+        pending = I.pending
+        pending[lo] = I._combine(pending.get(lo), delta)
+        pending[hi+1] = I._combine(pending.get(hi+1), [-d for d in delta])
+
+    def _flush(I):
+        total = None
+        points = sorted(I.pending)
+        for lo, hi in zip(points, points[1:]):
+            total = I._combine(total, I.pending[lo])
+            if any(total):
+                I._add(1, 0, I.n-1, lo, hi-1, total)
+        I.pending = {}
+
+    def _add(I, s, l, r, lo, hi, delta):
+        if lo <= l and r <= hi:
+            I.lazy[s] = I._combine(I.lazy[s], delta)
+            return
+        m = (l+r) // 2
+        if lo <= m:
+            I._add(2*s, l, m, lo, hi, delta)
+        if hi > m:
+            I._add(2*s+1, m+1, r, lo, hi, delta)
+        I._pull(s)
+
+    def top(I):
+        """Aggregate of all positions."""
+        if I.pending:
+            I._flush()
+        return I.shift(I.agg[1], I.lazy[1])
+
+
+class RatioIndex(_Index):
+    """Node with the largest zig-zig depth over zig-zag depth (the latter
+    taken as at least 1), ties broken by smaller zig-zag depth, then larger
+    depth, then smaller rank, as in zigzig.max_ratio.
+
+    Within one zig-zag depth that order is linear, so each segment keeps,
+    per zig-zag depth, its best (zig-zig depth, depth, -rank). A query or
+    a rebuilt segment costs the number of distinct zig-zag depths."""
+
+    def __init__(I, D):
+        I.maps = D
+        leaves = []
+        for i in range(len(D)):
+            d, zz, zg = D.values[i]
+            leaves.append({zg: (zz, d, -i)})
+        super(RatioIndex, I).__init__(leaves)
+        D.listeners.append(I.add)
+
+    @staticmethod
+    def shift(table, delta):
+        if delta is None:
+            return table
+        dd, dz, dg = delta
+        return {g+dg: (zz+dz, d+dd, i) for g, (zz, d, i) in table.items()}
+
+    @staticmethod
+    def merge(a, b):
+        c = dict(a)
+        for g, v in b.items():
+            if g not in c or v > c[g]:
+                c[g] = v
+        return c
+
+    def best(I):
+        """The node of largest ratio."""
+        g, (zz, d, i) = max(I.top().items(), key=lambda item: (
+            1.*item[1][0]/max(1, item[0]), -item[0], item[1][1:]))
+        return I.maps.nodes[-i]
+
+
+class MaxIndex(_Index):
+    """Rank maximizing the sum over (maps, weights) pairs of the weights
+    dotted with the maps' values, ties going to the smaller rank. All maps
+    must be of trees on the same keys."""
+
+    def __init__(I, *weighted):
+        n = len(weighted[0][0])
+        leaves = [(sum(w*v for D, ws in weighted
+                       for w, v in zip(ws, D.values[i])), -i)
+                  for i in range(n)]
+        super(MaxIndex, I).__init__(leaves)
+        for D, ws in weighted:
+            D.listeners.append(I._listener(ws))
+
+    def _listener(I, ws):
+        def add(lo, hi, delta):
+            d = sum(w*v for w, v in zip(ws, delta))
+            if d:
+                I.add(lo, hi, (d,))
+        return add
+
+    @staticmethod
+    def shift(agg, delta):
+        return agg if delta is None else (agg[0] + delta[0], agg[1])
+
+    @staticmethod
+    def merge(a, b):
+        return max(a, b)
+
+    def best(I):
+        """(largest value, its rank)."""
+        v, i = I.top()
+        return v, -i
+
+
+def _brute_max_ratio(n, k):
+    """The key sequence of zigzig.max_ratio, recomputing every map."""
+    import zigzig
+    t = zigzig.tree_nodes("r"*(n-1))
+    s = []
+    for _ in range(k):
+        r = t[1].root()
+        zig = zigzig.zigzig_depths(r)
+        zag = zigzig.zagzig_depths(r)
+        d = zigzig.depths(r)
+        key = max(range(1, n+1), key=lambda i: (
+            1.*zig[i]/max(1, zag[i]), -zag[i], d[i]))
+        s.append(key)
+        t[key].splay()
+    return s
+
+
+def benchmark(k=12, steps=500):
+    import zigzig
+    n = 2**k - 1
+    ts = time()
+    zigzig.max_ratio(n, steps, encode=False)
+    tm = time()
+    _brute_max_ratio(n, steps)
+    tf = time()
+    print("%d max ratio splays on %d nodes: incremental %.3fs, "
+          "recomputed %.3fs" % (steps, n, tm-ts, tf-tm))
+
+
+class TestDepthMaps(unittest.TestCase):
+
+    def test_against_recomputation(self):
+        """Test the maps against zigzig's maps through random adjustments."""
+        import zigzig
+        seed(10)
+        t = zigzig.tree_nodes("r"*40)
+        D = DepthMaps(t[i] for i in range(1, 42))
+        for _ in range(300):
+            x = t[randrange(1, 42)]
+            [D.splay, D.simple_splay, D.move_to_root,
+             lambda x: x.parent and D.rotate(x)][randrange(4)](x)
+            r = t[1].root()
+            maps = (zigzig.depths(r), zigzig.zigzig_depths(r),
+                    zigzig.zagzig_depths(r))
+            for i in range(1, 42):
+                self.assertEqual(tuple(m[i] for m in maps), D.value(t[i]))
+
+    def test_max_ratio(self):
+        """Test the ratio index picks the keys full recomputation picks."""
+        import zigzig
+        for n, k in ((1, 3), (15, 40), (31, 60)):
+            self.assertEqual(_brute_max_ratio(n, k),
+                             zigzig.max_ratio(n, k, encode=False)[0])
+
+    def test_max_index(self):
+        """Test splay depth less move-to-root levels, as in break_wilber."""
+        seed(11)
+        M = bst.Tree(range(1, 21))
+        S = bst.Tree(range(1, 21))
+        DM = DepthMaps(M.root.inorder_nodes())
+        DS = DepthMaps(S.root.inorder_nodes())
+        I = MaxIndex((DS, (1, 0, 0)), (DM, (0, 0, -1)))
+        for _ in range(100):
+            d = S.depths()
+            l = M.levels()
+            v = max(d[i] - l[i] for i in range(1, 21))
+            k = min(i for i in range(1, 21) if d[i] - l[i] == v)
+            self.assertEqual((v, k-1), I.best())
+            k = randrange(1, 21)
+            M.root = DM.move_to_root(M.find(k))
+            S.root = DS.splay(S.find(k))
+        self.assertEqual(0, len(DepthMaps([])))
+
+
+if __name__ == '__main__':
+    benchmark()
+    unittest.main()
@@ -0,0 +1,307 @@
+"""Bottom-up splay tree kept in a memory-mapped file of fixed-width
+"key, parent, left, right" records, the same layout as arraybst.ArrayTree.
+
+The file is usable as soon as it is mapped, so a tree persists across runs
+with no load step. Records are read and written through a small LRU cache
+of pages, and every operation records how many distinct pages it touched,
+so the locality that splaying buys is measurable."""
+from __future__ import print_function
+
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from collections import OrderedDict
+from random import randrange, seed, shuffle
+
+from bst import Tree
+
+
+RECORD = struct.Struct("<qqqq")
+MAGIC = 0x5350_4c41_5954_5231  # "SPLAYTR1"
+
+null = 0
+key = 0
+parent = 1
+left = 2
+right = 3
+
+
+class DiskSplayTree(object):
+    """Splay tree of 64-bit integer keys stored in the file at path.
+
+    Record 0 is the header (magic, root, count, page size) and nodes are
+    records 1...count; index 0 doubles as the null pointer."""
+
+    def __init__(T, path, cache_pages=64, page_size=4096):
+        if cache_pages < 4:
+            raise ValueError("A rotation may touch four pages at once")
+        if page_size % RECORD.size:
+            raise ValueError("Page size must be a multiple of the record size")
+        T.cache_pages = cache_pages
+        T.touches = []  # Distinct pages touched by each operation
+        T.misses = 0  # Pages read into the cache
+        T._cache = OrderedDict()
+        T._dirty = set()
+        T._touched = set()
+        if os.path.exists(path) and os.path.getsize(path):
+            T._file = open(path, "r+b")
+            T._map = mmap.mmap(T._file.fileno(), 0)
+            magic, T.root, T.count, page_size = RECORD.unpack_from(T._map, 0)
+            if magic != MAGIC:
+                T._map.close()
+                T._file.close()
+                raise ValueError("%s is not a splay tree file" % path)
+        else:
+            T._file = open(path, "w+b")
+            T._file.truncate(page_size)
+            T._map = mmap.mmap(T._file.fileno(), 0)
+            T.root = null
+            T.count = 0
+        T.page_size = page_size
+        T._per_page = page_size // RECORD.size
+
+    def __len__(T):
+        return T.count
+
+    def __enter__(T):
+        return T
+
+    def __exit__(T, *exc):
+        T.close()
+
+    # Paging
+
+    def _page(T, p):
+        """Return the cached records of page p, reading it in if needed."""
+        T._touched.add(p)
+        cache = T._cache
+        if p in cache:
+            cache.move_to_end(p)
+            return cache[p]
+        T.misses += 1
+        offset = p * T.page_size
+        records = [list(RECORD.unpack_from(T._map, offset + j*RECORD.size))
+                   for j in range(T._per_page)]
+        cache[p] = records
+        if len(cache) > T.cache_pages:
+            T._write_back(*cache.popitem(last=False))
+        return records
+
+    def _write_back(T, p, records):
+        if p in T._dirty:
+            T._dirty.discard(p)
+            offset = p * T.page_size
+            for j, r in enumerate(records):
+                RECORD.pack_into(T._map, offset + j*RECORD.size, *r)
+
+    def _node(T, i, dirty=False):
+        """Return the mutable record of node i."""
+        p, j = divmod(i, T._per_page)
+        records = T._page(p)
+        if dirty:
+            T._dirty.add(p)
+        return records[j]
+
+    def _new_node(T, k, p):
+        i = T.count + 1
+        size = (i // T._per_page + 1) * T.page_size
+        if size > len(T._map):
+            T._map.resize(max(size, 2*len(T._map)))
+        T.count = i
+        T._node(i, True)[:] = [k, p, null, null]
+        return i
+
+    def _begin(T):
+        T._touched = set()
+
+    def _end(T):
+        T.touches.append(len(T._touched))
+
+    def flush(T):
+        """Write cached pages and the header back to the file."""
+        for p, records in T._cache.items():
+            T._write_back(p, records)
+        RECORD.pack_into(T._map, 0, MAGIC, T.root, T.count, T.page_size)
+        T._map.flush()
+
+    def close(T):
+        if T._map.closed:
+            return
+        T.flush()
+        T._cache.clear()
+        T._map.close()
+        T._file.close()
+
+    # Self-adjustment
+
+    def _rotate(T, x):
+        """Rotate the edge between x and its parent."""
+        X = T._node(x, True)
+        y = X[parent]
+        Y = T._node(y, True)
+        if Y[left] == x:
+            w = X[right]
+            Y[left] = w
+            X[right] = y
+        else:
+            w = X[left]
+            Y[right] = w
+            X[left] = y
+        if w != null:
+            T._node(w, True)[parent] = y
+        z = Y[parent]
+        X[parent] = z
+        Y[parent] = x
+        if z == null:
+            T.root = x
+        else:
+            Z = T._node(z, True)
+            if Z[left] == y:
+                Z[left] = x
+            else:
+                Z[right] = x
+
+    def _splay(T, x):
+        while True:
+            y = T._node(x)[parent]
+            if y == null:
+                return
+            z = T._node(y)[parent]
+            if z != null:
+                if (T._node(z)[left] == y) == (T._node(y)[left] == x):
+                    T._rotate(y)  # zig-zig
+                else:
+                    T._rotate(x)  # zig-zag
+            T._rotate(x)
+
+    def _find(T, k):
+        """Return last node on the search path for k."""
+        x = y = T.root
+        while x != null:
+            y = x
+            X = T._node(x)
+            if k < X[key]:
+                x = X[left]
+            elif k > X[key]:
+                x = X[right]
+            else:
+                break
+        return y
+
+    # Public interface
+
+    def insert(T, k):
+        """Insert key k and splay it to the root."""
+        T._begin()
+        y = T._find(k)
+        if y == null:
+            T.root = T._new_node(k, null)
+        else:
+            Y = T._node(y)
+            if k != Y[key]:
+                x = T._new_node(k, y)
+                T._node(y, True)[left if k < Y[key] else right] = x
+                y = x
+            T._splay(y)
+        T._end()
+
+    def __contains__(T, k):
+        """Search for k, splaying the last node on the search path."""
+        T._begin()
+        y = T._find(k)
+        found = y != null and T._node(y)[key] == k
+        if y != null:
+            T._splay(y)
+        T._end()
+        return found
+
+    def _walk(T, preorder):
+        x = T.root
+        stack = []
+        while stack or x != null:
+            if x != null:
+                X = T._node(x)
+                if preorder:
+                    yield X[key]
+                stack.append(X)
+                x = X[left]
+            else:
+                X = stack.pop()
+                if not preorder:
+                    yield X[key]
+                x = X[right]
+
+    def inorder(T):
+        return tuple(T._walk(False))
+
+    def preorder(T):
+        return tuple(T._walk(True))
+
+
+class TestDiskSplayTree(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "tree.bin")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_matches_bottom_up_splay(self):
+        """Test shapes agree with bst.Tree splaying the same keys."""
+        seed(2)
+        keys = [randrange(-500, 500) for _ in range(800)]
+        S = Tree()
+        with DiskSplayTree(self.path, cache_pages=4, page_size=256) as D:
+            for k in keys:
+                D.insert(k)
+                S.splay(k)
+            for k in keys[::-1]:
+                self.assertIn(k, D)
+                S.splay(k)
+            self.assertEqual(S.preorder(), D.preorder())
+            self.assertEqual(tuple(sorted(set(keys))), D.inorder())
+            self.assertEqual(len(set(keys)), len(D))
+            self.assertNotIn(1000, D)
+            self.assertTrue(D.misses > 4)
+
+    def test_persistence(self):
+        """Test the tree reopens in the same shape without rebuilding."""
+        keys = list(range(300))
+        shuffle(keys)
+        with DiskSplayTree(self.path, page_size=512) as D:
+            for k in keys:
+                D.insert(k)
+            shape = D.preorder()
+        with DiskSplayTree(self.path, page_size=512) as D:
+            self.assertEqual(shape, D.preorder())
+            self.assertEqual(300, len(D))
+            self.assertIn(150, D)
+            D.insert(1000)
+        with DiskSplayTree(self.path) as D:
+            self.assertEqual(301, len(D))
+            self.assertEqual(1000, D._node(D.root)[key])
+        with open(self.path, "r+b") as f:
+            f.write(b"\0" * 8)
+        with self.assertRaises(ValueError):
+            DiskSplayTree(self.path)
+        with self.assertRaises(ValueError):
+            DiskSplayTree(self.path, cache_pages=2)
+
+    def test_page_touches(self):
+        """Test repeated access to a hot key touches a single page."""
+        with DiskSplayTree(self.path, page_size=256) as D:
+            for k in range(1000):
+                D.insert(k)
+            self.assertEqual(1000, len(D.touches))
+            7 in D
+            7 in D
+            self.assertEqual(1, D.touches[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
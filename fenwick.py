@@ -0,0 +1,83 @@
+"""Fenwick tree of prefix folds, for upperbounds and depthmaps.
+
+Position i holds a value folded from every add to it, and a prefix fold
+of positions 0...i costs O(log n), as does an add. op must be associative
+and commutative with identity zero: sums, maxima, or vector sums, which
+read over differences give range additions with point reads."""
+from __future__ import print_function
+
+import operator
+import unittest
+
+from random import randrange, seed
+
+
+class Fenwick(object):
+    """Prefix folds of op over positions 0...n-1, all starting at zero, or
+    at the given values."""
+
+    __slots__ = ("tree", "op", "zero")
+
+    def __init__(F, n, op=operator.add, zero=0, values=None):
+        tree = [zero]*(n+1)
+        if values is not None:
+            # Each node folds its own value into its parent, in O(n)
+            for i, v in enumerate(values, start=1):
+                tree[i] = op(tree[i], v)
+                k = i + (i & -i)
+                if k <= n:
+                    tree[k] = op(tree[k], tree[i])
+        F.tree = tree
+        F.op = op
+        F.zero = zero
+
+    def __len__(F):
+        return len(F.tree) - 1
+
+    def add(F, i, v):
+        """Fold v into position i."""
+        tree, op = F.tree, F.op
+        i += 1
+        while i < len(tree):
+            tree[i] = op(tree[i], v)
+            i += i & -i
+
+    def prefix(F, i):
+        """Fold of positions 0...i."""
+        tree, op = F.tree, F.op
+        v = F.zero
+        i += 1
+        while i > 0:
+            v = op(v, tree[i])
+            i -= i & -i
+        return v
+
+
+class TestFenwick(unittest.TestCase):
+
+    def test_against_lists(self):
+        """Test sums and maxima, with and without initial values."""
+        seed(30)
+        for n in (1, 2, 7, 40):
+            for op, zero in ((operator.add, 0), (max, -1)):
+                values = [randrange(9) for _ in range(n)]
+                F = Fenwick(n, op, zero, values)
+                G = Fenwick(n, op, zero)
+                for i, v in enumerate(values):
+                    G.add(i, v)
+                for _ in range(30):
+                    i, v = randrange(n), randrange(9)
+                    F.add(i, v)
+                    G.add(i, v)
+                    values[i] = op(values[i], v)
+                    for j in range(n):
+                        expected = zero
+                        for w in values[:j+1]:
+                            expected = op(expected, w)
+                        self.assertEqual(expected, F.prefix(j))
+                        self.assertEqual(expected, G.prefix(j))
+                self.assertEqual(n, len(F))
+
+
+if __name__ == '__main__':
+    unittest.main()
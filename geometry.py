@@ -4,7 +4,11 @@ Optimality."""
 import unittest
 from operator import attrgetter
 
+import numpy as np
+
+from arraysim import jit
 from bst import maker, splay_cost, mr_crossing_cost, Tree
+from maxtree import assign, build, ngl, ngr
 
 
 Left = object()
@@ -353,22 +357,74 @@ def GreedyExecution(X, T=None):
         A[k].pop()
         x.priority = A[k][-1]
         labels = x.path_comparison_labels()
-        keys = tuple(y.key for y in x.sorted_path())
+        path = x.sorted_path()
+        keys = tuple(y.key for y in path)
         Q = treap(keys, labels, heap_winner=label_compare)
         Q_post = Q.postorder_nodes()
-        for y in Q.inorder_nodes():
-            y.priority = y.priority[0]
+        for y, z in zip(Q.inorder_nodes(), path):
+            y.priority = z.priority
         subtrees = x.split_path_subtrees()
         attach(Q, subtrees)
         _update_labels(Q_post)
         T = Q
 
 
+@jit
+def _greedy(r, n, initial, touches):
+    """Write the number of ranks Greedy touches at each access of r, from
+    the last-touch times initial of every rank before the first access."""
+    tree, size = build(initial)
+    stair = np.zeros(n, np.int64)
+    for i in range(len(r)):
+        x = r[i]
+        t = tree[x+size]
+        stair[0] = x
+        c = 1
+        y = ngl(tree, size, x-1, t)
+        while y >= 0:
+            stair[c] = y
+            c += 1
+            y = ngl(tree, size, y-1, tree[y+size])
+        y = ngr(tree, size, n, x+1, t)
+        while y < n:
+            stair[c] = y
+            c += 1
+            y = ngr(tree, size, n, y+1, tree[y+size])
+        for j in range(c):
+            assign(tree, size, stair[j], i)
+        touches[i] = c
+
+
+def greedy_touches(X, T=None):
+    """Array of the number of nodes on each search path of
+    GreedyExecution(X, T), found on the point set instead of the tree: each
+    access touches the keys on the staircases of last-touch times either
+    side of it. The tree T is the rows of its levels before the first
+    access, the root last, and the canonical tree is no rows at all. Each
+    touched key costs O(log n)."""
+    X = list(X)
+    keys = set(X)
+    if T is not None:
+        depth = {}
+        for x in T.preorder_nodes():
+            depth[x.key] = depth[x.parent.key] + 1 if x.parent else 0
+        assert keys.issubset(depth)
+        keys = depth
+    keys = sorted(keys)
+    rank = {k: i for i, k in enumerate(keys)}
+    initial = np.full(len(keys), -1, dtype=np.int64)
+    if T is not None:
+        for k, d in depth.items():
+            initial[rank[k]] = -2 - d
+    touches = np.zeros(len(X), dtype=np.int64)
+    if X:
+        _greedy(np.array([rank[k] for k in X], dtype=np.int64), len(keys),
+                initial, touches)
+    return touches
+
+
 def greedy_cost(X, T=None):
-    cost = 0
-    for _, x in GreedyExecution(X, T):
-        cost += len(x.path())
-    return cost
+    return int(greedy_touches(X, T).sum())
 
 
 def greedy_crossing_cost(X, T=None):
@@ -378,6 +434,67 @@ def greedy_crossing_cost(X, T=None):
     return cost
 
 
+# Independent rectangle lower bound. SignedGreedy on one side runs Greedy
+# over the access points, but only satisfies the rectangles whose earlier
+# corner lies on that side of the access: at each access it touches every
+# key on the staircase of last-touch times seen from the accessed key. The
+# count of points it adds is the largest independent set of rectangles of
+# that sign (Demaine, Harmon, Iacono, Kane and Patrascu 2009).
+
+
+@jit
+def _signed_greedy(r, n):
+    """Number of points SignedGreedy adds on the left of the accesses to
+    ranks r."""
+    tree, size = build(np.full(n, -1, np.int64))
+    stair = np.zeros(n, np.int64)
+    added = 0
+    for i in range(len(r)):
+        x = r[i]
+        c = 0
+        y = ngl(tree, size, x-1, tree[x+size])
+        while y >= 0:
+            stair[c] = y
+            c += 1
+            y = ngl(tree, size, y-1, tree[y+size])
+        for j in range(c):
+            assign(tree, size, stair[j], i)
+        assign(tree, size, x, i)
+        added += c
+    return added
+
+
+def signed_greedy(X, side=Left):
+    """Number of points SignedGreedy adds to the access points of X,
+    satisfying only rectangles with their earlier corner on the given side
+    of the later one. Each added point costs O(log n)."""
+    keys = sorted(set(X))
+    n = len(keys)
+    if side is Left:
+        rank = {k: i for i, k in enumerate(keys)}
+    else:
+        rank = {k: n-1-i for i, k in enumerate(keys)}
+    if not n:
+        return 0
+    return int(_signed_greedy(np.array([rank[k] for k in X], dtype=np.int64),
+                              n))
+
+
+def rectangle_bound(X):
+    """Independent rectangle lower bound on the cost of serving X: at least
+    |X| + |I|/2 for any independent set I of rectangles, here the larger of
+    the two signed sets."""
+    X = list(X)
+    return len(X) + max(signed_greedy(X, Left), signed_greedy(X, Right))//2
+
+
+def cost_bracket(X, T=None):
+    """Independent rectangle lower bound and Greedy's cost of X, from the
+    tree T (by default the canonical tree)."""
+    X = list(X)
+    return rectangle_bound(X), greedy_cost(X, T)
+
+
 class TestUtilities(unittest.TestCase):
 
     def test_infinity(self):
@@ -717,6 +834,68 @@ class TreapExecutionTests(unittest.TestCase):
             (8, 4, 2, 1, 3, 6, 5, 7, 10, 9, 11)
         )
 
+    def test_greedy_touches(self):
+        """Test the point set Greedy against the tree execution."""
+        from random import randrange, seed, shuffle
+        seed(19)
+        for n in (1, 5, 30):
+            X = [randrange(n) for _ in range(120)]
+            keys = list(range(n))
+            shuffle(keys)
+            for T in (None, canonical_tree(keys)):
+                self.assertEqual([len(x.path())
+                                  for _, x in GreedyExecution(X, T)],
+                                 greedy_touches(X, T).tolist())
+        X = (8, 9, 4, 6, 10, 11, 2, 6)
+        T = canonical_tree((4, 2, 1, 3, 10, 6, 5, 8, 7, 9, 11))
+        self.assertEqual(greedy_cost(X, T),
+                         sum(len(x.path()) for _, x in GreedyExecution(X, T)))
+        self.assertEqual(0, greedy_cost([]))
+
+
+class RectangleBoundTests(unittest.TestCase):
+
+    def _brute(self, X, side):
+        """SignedGreedy by testing every rectangle against every point."""
+        points = set()
+        added = 0
+        for i, x in enumerate(X):
+            new = set()
+            for (y, t) in points:
+                if not (y < x if side is Left else y > x):
+                    continue
+                lo, hi = min(x, y), max(x, y)
+                if not any(lo <= z <= hi and t <= u and (z, u) != (y, t)
+                           for (z, u) in points):
+                    new.add(y)
+            added += len(new)
+            points |= {(y, i) for y in new}
+            points.add((x, i))
+        return added
+
+    def test_signed_greedy(self):
+        """Test the sweep against checking rectangles directly."""
+        from random import randrange, seed
+        seed(15)
+        for n in (1, 3, 8, 20):
+            X = [randrange(n) for _ in range(60)]
+            for side in (Left, Right):
+                self.assertEqual(self._brute(X, side), signed_greedy(X, side))
+
+    def test_bracket(self):
+        """Test the bound stays below Greedy and splay."""
+        from random import randrange, seed
+        seed(16)
+        for X in ([randrange(30) for _ in range(200)], list(range(1, 40)),
+                  [1, 8, 4, 12, 2, 10, 6, 14, 1, 9, 5, 13, 3, 11, 7, 15]):
+            lower, upper = cost_bracket(X)
+            self.assertTrue(len(X) <= lower <= upper)
+            self.assertTrue(lower <= splay_cost(X))
+        # Sequential access: each access spans an empty rectangle with the
+        # one before, all of them on the left
+        self.assertEqual(49, signed_greedy(range(50), Left))
+        self.assertEqual(0, signed_greedy(range(50), Right))
+
 
 if __name__ == '__main__':
     from random import shuffle, randrange
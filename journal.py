@@ -0,0 +1,253 @@
+"""Undo journal of rotations and insertions, for forking a simulation.
+
+A rotation is its own inverse: after x.rotate(), rotating x's old parent
+puts the edge back. So the journal keeps only the node that went down on
+each rotation, and each inserted leaf, and rolling back to a mark costs
+O(changes since the mark) rather than a rebuild of the tree. Works with
+bst.Node and pathcodes.Node alike."""
+from __future__ import print_function
+
+import unittest
+
+from contextlib import contextmanager
+from random import randrange, seed
+from time import time
+
+import bst
+
+
+class Journal(object):
+    """Adjust trees through the journal to be able to roll them back."""
+
+    __slots__ = ("entries",)
+
+    def __init__(J):
+        J.entries = []
+
+    def __len__(J):
+        return len(J.entries)
+
+    def rotate(J, x):
+        """Rotate the edge between x and its parent."""
+        y = x.parent
+        x.rotate()
+        J.entries.append(y)
+
+    def inserted(J, y):
+        """Record that y was just inserted as a leaf."""
+        J.entries.append((y,))
+
+    def splay(J, x):
+        while x.parent is not None:
+            y = x.parent
+            z = y.parent
+            if z is not None:
+                if (y is z.left) == (x is y.left):
+                    J.rotate(y)  # zig-zig
+                else:
+                    J.rotate(x)  # zig-zag
+            J.rotate(x)
+        return x
+
+    def simple_splay(J, x):
+        while x.parent is not None:
+            y = x.parent
+            z = y.parent
+            if z is not None and (y is z.left) == (x is y.left):
+                J.rotate(y)
+            J.rotate(x)
+        return x
+
+    def move_to_root(J, x):
+        while x.parent is not None:
+            J.rotate(x)
+        return x
+
+    def mark(J):
+        return len(J.entries)
+
+    def rollback(J, mark=0):
+        """Undo every change made since mark, last first."""
+        entries = J.entries
+        while len(entries) > mark:
+            e = entries.pop()
+            if type(e) is tuple:
+                _detach(e[0])
+            else:
+                e.rotate()
+
+    @contextmanager
+    def fork(J):
+        """Roll back whatever is done inside the with block."""
+        m = J.mark()
+        try:
+            yield J
+        finally:
+            J.rollback(m)
+
+
+def _detach(y):
+    """Remove the leaf y, and its entry in any snapshot of its tree."""
+    z = y.parent
+    if z is not None:
+        if y is z.left:
+            z.left = None
+        else:
+            z.right = None
+        y.parent = None
+    s = y.initial
+    if s is not None:
+        for t in s.family:
+            if len(t.inserts) >= 3 and t.inserts[-3] is y:
+                del t.inserts[-3:]
+
+
+class ForkableTree(bst.Tree):
+    """bst.Tree whose accesses can be rolled back with mark()/rollback(),
+    or tried out inside fork()."""
+
+    def __init__(T, iterable=None):
+        T.journal = Journal()
+        super(ForkableTree, T).__init__(iterable)
+
+    def reset(T):
+        """Reset to the initial tree, which also forgets the journal."""
+        super(ForkableTree, T).reset()
+        T.commit()
+
+    def find(T, k):
+        """Find node with key k, inserting it if not present."""
+        x = T.root
+        if x is None:
+            x = T.root = bst.Node(k)
+            T.journal.inserted(x)
+            return x
+        while True:
+            if k < x:
+                if x.left is None:
+                    y = x.insert_left(k)
+                    break
+                x = x.left
+            elif k > x:
+                if x.right is None:
+                    y = x.insert_right(k)
+                    break
+                x = x.right
+            else:
+                return x
+        T.journal.inserted(y)
+        return y
+
+    def splay(T, k):
+        T.root = T.journal.splay(T.find(k))
+
+    def move_to_root(T, k):
+        T.root = T.journal.move_to_root(T.find(k))
+
+    def simple_splay(T, k):
+        T.root = T.journal.simple_splay(T.find(k))
+
+    def mark(T):
+        return (T.journal.mark(), T.root)
+
+    def commit(T):
+        """Forget the journal, making everything so far permanent."""
+        T.journal = Journal()
+
+    def rollback(T, mark):
+        m, T.root = mark
+        T.journal.rollback(m)
+
+    @contextmanager
+    def fork(T):
+        m = T.mark()
+        try:
+            yield T
+        finally:
+            T.rollback(m)
+
+
+def benchmark(n=2000, candidates=200):
+    """Time evaluating candidate accesses by forking against checkpoint()."""
+    keys = [randrange(n) for _ in range(n)]
+    T = ForkableTree(keys)
+    probes = [randrange(n) for _ in range(candidates)]
+    ts = time()
+    for k in probes:
+        with T.fork():
+            T.splay(k)
+            T.splay(probes[0])
+    tm = time()
+    for k in probes:
+        Q = T.checkpoint()
+        Q.splay(k)
+        Q.splay(probes[0])
+    tf = time()
+    print("fork %.3fs, checkpoint %.3fs" % (tm-ts, tf-tm))
+
+
+class TestJournal(unittest.TestCase):
+
+    def test_rollback_restores_shape(self):
+        """Test rolling back splays, moves and inserts restores the tree."""
+        seed(4)
+        T = ForkableTree(randrange(100) for _ in range(60))
+        shape = T.preorder()
+        m = T.mark()
+        for _ in range(200):
+            k = randrange(150)
+            [T.splay, T.move_to_root, T.simple_splay][randrange(3)](k)
+        self.assertNotEqual(shape, T.preorder())
+        T.rollback(m)
+        self.assertEqual(shape, T.preorder())
+        self.assertEqual(0, len(T.journal))
+        T.reset()
+        self.assertEqual(shape, T.preorder())
+
+    def test_fork_matches_bst(self):
+        """Test accesses inside a fork behave as on a plain tree."""
+        s = [5, 2, 8, 1, 9, 3, 7]
+        T = ForkableTree(s)
+        t = [4, 1, 9, 6, 1]
+        with T.fork():
+            for k in t:
+                T.splay(k)
+            Q = bst.Tree(s)
+            for k in t:
+                Q.splay(k)
+            self.assertEqual(Q.preorder(), T.preorder())
+        self.assertEqual(bst.Tree(s).preorder(), T.preorder())
+        with T.fork():
+            T.splay(4)
+            S = T.snapshot()
+            self.assertEqual(0, len(S.inserts))
+            with T.fork():
+                T.splay(6)
+                self.assertEqual(3, len(S.inserts))
+            self.assertEqual(0, len(S.inserts))
+        self.assertEqual(bst.Tree(s).preorder(), T.preorder())
+
+    def test_empty_tree(self):
+        """Test the first insertion is undone too."""
+        T = ForkableTree()
+        with T.fork():
+            T.splay(1)
+            T.splay(2)
+        self.assertFalse(T)
+
+    def test_pathcodes_nodes(self):
+        """Test the journal also drives keyless pathcodes nodes."""
+        from pathcodes import Node
+        t = Node.from_cursor("r"*20)
+        nodes = t.inorder()
+        shape = t.cursor()
+        J = Journal()
+        for i in (5, 17, 2, 11):
+            J.splay(nodes[i])
+        J.rollback()
+        self.assertEqual(shape, nodes[0].root().cursor())
+
+
+if __name__ == '__main__':
+    benchmark()
+    unittest.main()
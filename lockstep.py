@@ -0,0 +1,200 @@
+"""Splay or move-to-root many trees in lockstep with NumPy.
+
+N trees on the same n keys are stored as (N, n) parent, left and right
+index arrays, with -1 for null; keys are their ranks 0...n-1. Each access
+is applied to every tree at once: depths are found by climbing parent
+pointers for all trees together, and each splay step is a masked
+vectorized rotation over the trees whose accessed node is not yet the
+root. Costs come back as one vector per run, one entry per tree."""
+from __future__ import print_function
+
+import unittest
+
+from random import randrange, seed
+from time import time
+
+import numpy as np
+
+import bst
+from preorders import links
+from randombst import good_random_bst, preorder
+
+
+class Forest(object):
+    """N binary search trees over the ranks 0...n-1."""
+
+    __slots__ = ("parent", "left", "right", "root")
+
+    def __init__(F, N, n):
+        F.parent = np.full((N, n), -1, dtype=np.int32)
+        F.left = np.full((N, n), -1, dtype=np.int32)
+        F.right = np.full((N, n), -1, dtype=np.int32)
+        F.root = np.full(N, -1, dtype=np.int32)
+
+    def __len__(F):
+        return len(F.root)
+
+    @classmethod
+    def from_preorders(cls, preorders):
+        """Build one tree per preorder; all must hold the same keys."""
+        preorders = [list(p) for p in preorders]
+        keys = sorted(preorders[0])
+        rank = {k: i for i, k in enumerate(keys)}
+        F = cls(len(preorders), len(keys))
+        for t, p in enumerate(preorders):
+            p = [rank[k] for k in p]
+            if p:
+                F.root[t] = p[0]
+            for x, y, left in links(p):
+                (F.left if left else F.right)[t, y] = x
+                F.parent[t, x] = y
+        return F
+
+    def preorder(F, t):
+        """Preorder of the ranks in tree t."""
+        order = []
+        stack = [F.root[t]]
+        L, R = F.left[t], F.right[t]
+        while stack:
+            x = stack.pop()
+            order.append(int(x))
+            if R[x] >= 0:
+                stack.append(R[x])
+            if L[x] >= 0:
+                stack.append(L[x])
+        return order
+
+    def depths(F, x):
+        """Depth of rank x in every tree, the root having depth 1."""
+        P = F.parent
+        t = np.arange(len(F))
+        v = np.full(len(F), x, dtype=np.int32)
+        d = np.ones(len(F), dtype=np.int64)
+        while len(t):
+            v = P[t, v]
+            up = v >= 0
+            t = t[up]
+            v = v[up]
+            d[t] += 1
+        return d
+
+    def rotate(F, t, v):
+        """Rotate node v[i] over its parent in tree t[i], for all i at once.
+        No tree may appear twice in t."""
+        P, L, R = F.parent, F.left, F.right
+        y = P[t, v]
+        z = P[t, y]
+        left = L[t, y] == v
+        right = ~left
+        b = np.where(left, R[t, v], L[t, v])
+        L[t[left], y[left]] = b[left]
+        R[t[left], v[left]] = y[left]
+        R[t[right], y[right]] = b[right]
+        L[t[right], v[right]] = y[right]
+        has_b = b >= 0
+        P[t[has_b], b[has_b]] = y[has_b]
+        P[t, y] = v
+        P[t, v] = z
+        top = z < 0
+        F.root[t[top]] = v[top]
+        below = ~top
+        tz, zz, yz, vz = t[below], z[below], y[below], v[below]
+        zl = L[tz, zz] == yz
+        L[tz[zl], zz[zl]] = vz[zl]
+        R[tz[~zl], zz[~zl]] = vz[~zl]
+
+    def move_to_root(F, x):
+        P = F.parent
+        t = np.arange(len(F))
+        t = t[P[t, x] >= 0]
+        while len(t):
+            F.rotate(t, np.full(len(t), x, dtype=np.int32))
+            t = t[P[t, x] >= 0]
+
+    def splay(F, x):
+        P, L = F.parent, F.left
+        t = np.arange(len(F))
+        t = t[P[t, x] >= 0]
+        while len(t):
+            v = np.full(len(t), x, dtype=np.int32)
+            y = P[t, v]
+            z = P[t, y]
+            deep = z >= 0
+            td, yd, zd, vd = t[deep], y[deep], z[deep], v[deep]
+            zigzig = (L[td, zd] == yd) == (L[td, yd] == vd)
+            # First rotation of a zig-zig step is at y, of a zig-zag at x
+            F.rotate(td, np.where(zigzig, yd, vd))
+            F.rotate(t, v)
+            t = t[P[t, x] >= 0]
+
+
+def costs(F, s, algorithm="splay"):
+    """Access ranks s in every tree of F, returning each tree's total
+    cost as the number of nodes on its search paths."""
+    adjust = {"splay": Forest.splay, "move_to_root": Forest.move_to_root,
+              "mr": Forest.move_to_root}[algorithm]
+    total = np.zeros(len(F), dtype=np.int64)
+    for x in s:
+        total += F.depths(x)
+        adjust(F, x)
+    return total
+
+
+def random_forest(N, n):
+    """Forest of N uniformly random trees on n keys."""
+    return Forest.from_preorders(preorder(good_random_bst(n))
+                                 for _ in range(N))
+
+
+def benchmark(N=2000, n=100, m=200):
+    s = [randrange(n) for _ in range(m)]
+    preorders = [preorder(good_random_bst(n)) for _ in range(N)]
+    F = Forest.from_preorders(preorders)
+    ts = time()
+    costs(F, s)
+    tm = time()
+    for p in preorders:
+        T = bst.Tree(k-1 for k in p)
+        for k in s:
+            T.splay(k)
+    tf = time()
+    print("lockstep %.3fs, one tree at a time %.3fs, speedup %.1fx"
+          % (tm-ts, tf-tm, (tf-tm)/(tm-ts)))
+
+
+class TestLockstep(unittest.TestCase):
+
+    def test_against_bst(self):
+        """Test each tree's cost and final shape against bst.Tree."""
+        seed(6)
+        n = 30
+        preorders = [[k-1 for k in preorder(good_random_bst(n))]
+                     for _ in range(25)]
+        s = [randrange(n) for _ in range(120)]
+        for algorithm in ("splay", "move_to_root"):
+            F = Forest.from_preorders(preorders)
+            c = costs(F, s, algorithm)
+            for t, p in enumerate(preorders):
+                T = bst.Tree(p)
+                cost = 0
+                for k in s:
+                    x = T.find(k)
+                    cost += len(x.path())
+                    getattr(x, algorithm)()
+                    T.root = x
+                self.assertEqual(cost, c[t])
+                self.assertEqual(list(T.preorder()), F.preorder(t))
+
+    def test_preorders(self):
+        """Test trees are stored with the preorders they were built from."""
+        preorders = [(2, 1, 3), (1, 2, 3), (3, 2, 1), (1, 3, 2)]
+        F = Forest.from_preorders(preorders)
+        for t, p in enumerate(preorders):
+            self.assertEqual([k-1 for k in p], F.preorder(t))
+        self.assertEqual([2, 3, 1, 2], list(F.depths(2)))
+        self.assertEqual(7, len(random_forest(7, 5)))
+
+
+if __name__ == '__main__':
+    benchmark()
+    unittest.main()
@@ -0,0 +1,132 @@
+"""Max segment tree over ranks 0...n-1, for the jitted sweeps of mrtreap,
+geometry and arboral.
+
+The tree is a flat int64 array: leaf i at tree[size+i] for size the least
+power of two not below n, node k the max of nodes 2k and 2k+1, and the
+leaves beyond n padded with NONE. Each sweep keeps a time per rank (of
+last access, or last touch) and asks for the nearest rank on either side
+holding a later time, in O(log n)."""
+from __future__ import print_function
+
+import unittest
+
+from random import randrange, seed
+
+import numpy as np
+
+from arraysim import jit
+
+
+NONE = -2**62  # Value of the padding beyond rank n-1
+
+
+@jit
+def build(leaves):
+    """(tree, size) holding the values leaves at ranks 0...n-1."""
+    n = len(leaves)
+    size = 1
+    while size < n:
+        size *= 2
+    tree = np.full(2*size, NONE, np.int64)
+    tree[size:size+n] = leaves
+    for k in range(size-1, 0, -1):
+        tree[k] = max(tree[2*k], tree[2*k+1])
+    return tree, size
+
+
+@jit
+def assign(tree, size, i, v):
+    """Set rank i to v."""
+    k = i + size
+    tree[k] = v
+    k >>= 1
+    while k:
+        tree[k] = max(tree[2*k], tree[2*k+1])
+        k >>= 1
+
+
+@jit
+def ngr(tree, size, n, i, v):
+    """Least j >= i with value above v, or n."""
+    if i >= n:
+        return n
+    k = i + size
+    while tree[k] <= v:
+        while k & 1:
+            k >>= 1
+        if k == 0:
+            return n
+        k += 1
+    while k < size:
+        k *= 2
+        if tree[k] <= v:
+            k += 1
+    return k - size
+
+
+@jit
+def ngl(tree, size, i, v):
+    """Greatest j <= i with value above v, or -1."""
+    if i < 0:
+        return -1
+    k = i + size
+    while tree[k] <= v:
+        while k > 1 and not k & 1:
+            k >>= 1
+        if k == 1:
+            return -1
+        k -= 1
+    while k < size:
+        k = 2*k + 1
+        if tree[k] <= v:
+            k -= 1
+    return k - size
+
+
+@jit
+def span_max(tree, size, lo, hi):
+    """Largest value of ranks lo...hi."""
+    v = NONE
+    lo += size
+    hi += size + 1
+    while lo < hi:
+        if lo & 1:
+            v = max(v, tree[lo])
+            lo += 1
+        if hi & 1:
+            hi -= 1
+            v = max(v, tree[hi])
+        lo >>= 1
+        hi >>= 1
+    return v
+
+
+class TestMaxTree(unittest.TestCase):
+
+    def test_against_brute_force(self):
+        """Test every search after random assignments."""
+        seed(28)
+        for n in (1, 2, 5, 8, 13):
+            values = [randrange(-1, 6) for _ in range(n)]
+            tree, size = build(np.array(values, dtype=np.int64))
+            for _ in range(30):
+                i, v = randrange(n), randrange(-1, 6)
+                assign(tree, size, i, v)
+                values[i] = v
+                v = randrange(-2, 6)
+                for i in range(n+1):
+                    self.assertEqual(
+                        min([j for j in range(i, n) if values[j] > v] + [n]),
+                        ngr(tree, size, n, i, v))
+                for i in range(-1, n):
+                    self.assertEqual(
+                        max([j for j in range(i+1) if values[j] > v] + [-1]),
+                        ngl(tree, size, i, v))
+                for lo in range(n):
+                    for hi in range(lo, n):
+                        self.assertEqual(max(values[lo:hi+1]),
+                                         span_max(tree, size, lo, hi))
+
+
+if __name__ == '__main__':
+    unittest.main()
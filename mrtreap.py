@@ -0,0 +1,299 @@
+"""Offline move-to-root costs from the treap of last-access times.
+
+The move-to-root tree is the treap on the keys seen so far with priority
+the time of last access (geometry.treap, canonical_tree), so no rotation
+needs simulating. The subtree of y spans the open key interval between
+its nearest keys of higher priority, and the depth of x is the number of
+spans containing x: a Fenwick tree over ranks holds those counts.
+
+Accessing x gives it the top priority, which only shortens the spans of
+its ancestors. Going up from x the ancestors form alternating runs on the
+left and on the right of x, each ancestor in a run losing the same part
+of its span, and each run is found by one nearest-greater search in a
+max segment tree over priorities. An access therefore costs O(log n) per
+run, and the runs are exactly its crossing nodes other than x: the total
+is O((m + W) log n) for W the sum of crossing counts (Wilber's second
+bound plus m), which is O(m log^2 n) at worst, against O(total depth) for
+simulating the rotations.
+
+The same runs give Wilber's second bound: critical_nodes, scores and
+wilber2 agree with the wilber module's, which spends O(m^2) per access."""
+from __future__ import print_function
+
+import unittest
+
+from random import randrange, seed
+from time import time
+
+import numpy as np
+
+import arraysim
+import bst
+import pathcodes
+from arraysim import jit
+from maxtree import assign, build, ngl, ngr, span_max
+
+
+@jit
+def _stab(fenwick, i):
+    """Number of spans containing rank i."""
+    c = 0
+    i += 1
+    while i > 0:
+        c += fenwick[i]
+        i -= i & -i
+    return c
+
+
+@jit
+def _span(fenwick, lo, hi, c):
+    """Add c spans covering ranks lo...hi."""
+    n = len(fenwick) - 1
+    i = lo + 1
+    while i <= n:
+        fenwick[i] += c
+        i += i & -i
+    i = hi + 2
+    while i <= n:
+        fenwick[i] -= c
+        i += i & -i
+
+
+@jit
+def _mr_paths(s, n, order, depths, crossings, runs):
+    """Write depths and crossing counts, and if runs has room, the (top,
+    bottom) of each run of ancestors, lowest run first, access by access.
+    The tree starts from the preorder order of all ranks, if given."""
+    # Priorities: -1 for keys not yet seen, and below every access time
+    # and falling along the preorder for the initial tree
+    priorities = np.full(n, -1, np.int64)
+    for i in range(len(order)):
+        priorities[order[i]] = -2 - i
+    tree, size = build(priorities)
+    fenwick = np.zeros(n+1, np.int64)
+    for x in order:
+        p = tree[x+size]
+        _span(fenwick, ngl(tree, size, x-1, p) + 1,
+              ngr(tree, size, n, x+1, p) - 1, 1)
+    fill = runs.shape[1] > 0
+    r = 0
+    for t in range(len(s)):
+        x = s[t]
+        p = tree[x+size]
+        d = _stab(fenwick, x)
+        if p == -1:
+            d += 1  # Inserted as a leaf
+        # Lowest ancestors on either side
+        lo = ngl(tree, size, x-1, p)
+        hi = ngr(tree, size, n, x+1, p)
+        if p != -1:
+            _span(fenwick, lo+1, hi-1, -1)
+        k = 0
+        while lo >= 0 or hi < n:
+            k += 1
+            if hi == n or (lo >= 0 and tree[lo+size] < tree[hi+size]):
+                # Run of left ancestors below hi, all losing x...hi-1
+                c = _stab(fenwick, lo)
+                bottom = lo
+                if hi < n:
+                    c -= _stab(fenwick, hi)
+                    lo = ngl(tree, size, x-1, tree[hi+size])
+                else:
+                    lo = -1
+                _span(fenwick, x, hi-1, -c)
+                if fill:
+                    runs[0, r] = ngr(tree, size, n, lo+1,
+                                      span_max(tree, size, lo+1, bottom) - 1)
+            else:
+                c = _stab(fenwick, hi)
+                bottom = hi
+                if lo >= 0:
+                    c -= _stab(fenwick, lo)
+                    hi = ngr(tree, size, n, x+1, tree[lo+size])
+                else:
+                    hi = n
+                _span(fenwick, lo+1, x, -c)
+                if fill:
+                    runs[0, r] = ngl(tree, size, hi-1,
+                                      span_max(tree, size, bottom, hi-1) - 1)
+            if fill:
+                runs[1, r] = bottom
+                r += 1
+        _span(fenwick, 0, n-1, 1)
+        depths[t] = d
+        crossings[t] = k + 1
+        assign(tree, size, x, t)
+
+
+def _ranks(s, initial=None):
+    """Sorted keys, the ranks of s and the ranks of initial, which must hold
+    every key of s if given. Tuple keys are ranked whole."""
+    if initial is None:
+        initial = ()
+    a = np.asarray(s)
+    if a.ndim == 1 and a.dtype.kind in "iuf" and not len(initial):
+        keys, r = np.unique(a, return_inverse=True)
+        return keys.tolist(), r.astype(np.int64), _none
+    s = a.tolist() if a.ndim == 1 else list(s)
+    keys = sorted(set(initial) | set(s))
+    if len(initial) and len(keys) != len(set(initial)):
+        raise KeyError(sorted(set(keys) - set(initial))[0])
+    rank = {k: i for i, k in enumerate(keys)}
+    return (keys, np.array([rank[k] for k in s], dtype=np.int64),
+            np.array([rank[k] for k in initial], dtype=np.int64))
+
+
+_none = np.zeros(0, dtype=np.int64)
+_no_runs = np.zeros((2, 0), dtype=np.int64)
+
+
+def mr_paths(s, initial=None):
+    """Arrays of the depth and the number of crossing nodes of each access
+    of move-to-root on s: the len(x.path()) and len(x.crossing_nodes()) of
+    bst.mr_nodes. The tree starts empty, or from the tree with preorder
+    initial, which must then hold every key."""
+    keys, r, order = _ranks(s, initial)
+    depths = np.zeros(len(r), dtype=np.int64)
+    crossings = np.zeros(len(r), dtype=np.int64)
+    if len(r):
+        _mr_paths(r, len(keys), order, depths, crossings, _no_runs)
+    return depths, crossings
+
+
+def mr_cost(s):
+    return int(mr_paths(s)[0].sum())
+
+
+def mr_crossing_cost(s):
+    return int(mr_paths(s)[1].sum())
+
+
+# Wilber's second bound. The crossing nodes of an access are the tops of
+# its runs of ancestors and the node itself, and the inside nodes are the
+# bottoms of the runs; a key accessed for the first time is not in the
+# tree yet, so counts neither itself nor its parent.
+
+def _first(r):
+    first = np.zeros(len(r), dtype=bool)
+    first[np.unique(r, return_index=True)[1]] = True
+    return first
+
+
+def scores(s):
+    """Array of the Wilber 2 score (kappa) of each access, as in
+    wilber.scores."""
+    _, r, _ = _ranks(s)
+    _, crossings = mr_paths(s)
+    return crossings - 1 - (_first(r) & (crossings > 1))
+
+
+def wilber2(s):
+    """Wilber's second lower bound, as wilber.wilber2."""
+    return len(s) + int(scores(s).sum())
+
+
+def critical_nodes(s):
+    """For each access i of s, the (c, w, b, v) of
+    wilber.critical_nodes(s, i): the crossing accesses and nodes and the
+    inside accesses and nodes, root first, with accesses numbered from 1."""
+    s = list(s)
+    keys, r, _ = _ranks(s)
+    m = len(r)
+    depths = np.zeros(m, dtype=np.int64)
+    crossings = np.zeros(m, dtype=np.int64)
+    if not m:
+        return []
+    _mr_paths(r, len(keys), _none, depths, crossings, _no_runs)
+    runs = np.zeros((2, int(crossings.sum()) - m), dtype=np.int64)
+    _mr_paths(r, len(keys), _none, depths, crossings, runs)
+    first = _first(r)
+    last = {}  # Time of the last access of each rank, from 1
+    result = []
+    j = 0
+    for i in range(m):
+        k = crossings[i] - 1
+        tops = runs[0, j:j+k][::-1].tolist()
+        bottoms = runs[1, j:j+k][::-1].tolist()
+        j += k
+        x = int(r[i])
+        if first[i]:
+            bottoms = bottoms[:-1]
+        else:
+            tops.append(x)
+        result.append(([last[y] for y in tops], [keys[y] for y in tops],
+                       [last[y] for y in bottoms], [keys[y] for y in bottoms]))
+        last[x] = i + 1
+    return result
+
+
+def benchmark(n=10**5, m=10**7):
+    """Random accesses keep move-to-root paths short, so simulating them
+    is cheap; sequential ones make every path n long."""
+    mr_paths([0])  # Compile outside the timings
+    for name, s in (("random", np.random.randint(0, n, m)),
+                    ("sequential", np.arange(m // 100) % (n // 10))):
+        ts = time()
+        depths, crossings = mr_paths(s)
+        tm = time()
+        assert arraysim.mr_cost(s.tolist()) == depths.sum()
+        tf = time()
+        print("%d %s accesses: treap %.3fs, simulation %.3fs; cost %d, "
+              "crossings %d" % (len(s), name, tm-ts, tf-tm, depths.sum(),
+                                crossings.sum()))
+
+
+class TestMRTreap(unittest.TestCase):
+
+    def test_against_simulation(self):
+        """Test per-access depths and crossings against bst.mr_nodes."""
+        seed(12)
+        for n in (1, 2, 3, 10, 60):
+            s = [randrange(n) for _ in range(400)]
+            depths, crossings = mr_paths(s)
+            self.assertEqual([len(x.path()) for x in bst.mr_nodes(s)],
+                             list(depths))
+            self.assertEqual([len(x.crossing_nodes())
+                              for x in bst.mr_nodes(s)], list(crossings))
+
+    def test_critical_nodes(self):
+        """Test the critical and inside nodes against wilber.critical_nodes,
+        and the bound against wilber and bst."""
+        import wilber
+        seed(13)
+        for s in (list("aihjgfclkendbpmoi"),
+                  [randrange(12) for _ in range(70)],
+                  [randrange(200) for _ in range(70)]):
+            fast = critical_nodes(s)
+            for i in range(1, len(s)+1):
+                self.assertEqual(tuple(wilber.critical_nodes(s, i)),
+                                 fast[i-1])
+            self.assertEqual(wilber.scores(s), list(scores(s)))
+            self.assertEqual(wilber.wilber2(s), wilber2(s))
+            self.assertEqual(bst.wilber2(s), wilber2(s))
+            # Kozma's count starts from the right path on every key
+            _, crossings = mr_paths(s, sorted(set(s)))
+            self.assertEqual(pathcodes.MRBound(s),
+                             [max(0, c-2) for c in crossings])
+        self.assertEqual([], critical_nodes([]))
+
+    def test_costs(self):
+        """Test totals on sequential and bit reversal sequences."""
+        from wilber import bitReversalSequence
+        for s in (list(range(50))*3, bitReversalSequence(6), [5, 3, 9]):
+            self.assertEqual(bst.mr_cost(s), mr_cost(s))
+            self.assertEqual(bst.mr_crossing_cost(s), mr_crossing_cost(s))
+        self.assertEqual(0, mr_cost([]))
+        s = [4, 1, 3, 1, 2, 4]
+        initial = [2, 1, 4, 3]
+        self.assertEqual(arraysim.costs(s, "mr", initial).tolist(),
+                         mr_paths(s, initial)[0].tolist())
+        self.assertEqual(1+2+2, mr_cost(["c", "b", "a"]))
+        # Tuple keys are ranked whole, and an initial tree must hold s
+        s = [(1, 2), (0, 5), (1, 2), (3, 0)]
+        self.assertEqual(bst.mr_cost(s), mr_cost(s))
+        self.assertRaises(KeyError, mr_paths, [5, 1, 3, 5, 1], [3, 1])
+
+
+if __name__ == '__main__':
+    benchmark()
+    unittest.main()
@@ -0,0 +1,180 @@
+"""Exact offline optimum for access sequences on a few keys.
+
+An access to x costs the number of nodes on its search path, after which
+the path may be rebuilt into any tree on its keys by rotations among the
+path nodes, the subtrees hanging off it staying in place. OPT(X) is the
+least total cost of X over all such executions.
+
+A tree on n keys is known by its treerank rank, so after each access the
+least cost of reaching every tree is a vector of B(n) entries, and one
+access relaxes it in two steps: each tree passes its distance plus its
+path length to its class (the path keys and the subtrees hanging off
+them), and each class passes its best to every tree it can be rebuilt
+into. The classes of each accessed key are built once per n. B(10) is
+16796, and each further key multiplies the work by about five."""
+from __future__ import print_function
+
+import unittest
+
+from bisect import bisect
+from random import randrange, seed, shuffle
+from time import time
+
+import numpy as np
+
+import arraysim
+from treerank import B, memoize, treegen
+
+
+@memoize
+def _trees(n):
+    """Preorders on 1...n by rank, from 1, and the index of each."""
+    trees = list(treegen(n))
+    return trees, {p: i for i, p in enumerate(trees)}
+
+
+def _path(p, x):
+    """Sorted keys of the search path to x in the tree with preorder p, and
+    the preorder of the subtree hanging in each gap between them."""
+    path = []
+    hanging = []
+    while True:
+        r = p[0]
+        path.append(r)
+        left = tuple(k for k in p[1:] if k < r)
+        right = tuple(k for k in p[1:] if k > r)
+        if x < r:
+            hanging.append(right)
+            p = left
+        elif x > r:
+            hanging.append(left)
+            p = right
+        else:
+            hanging += [left, right]
+            break
+    S = tuple(sorted(path))
+    H = [()]*(len(S)+1)
+    for h in hanging:
+        if h:
+            H[bisect(S, h[0])] = h
+    return S, tuple(H)
+
+
+def _assemble(q, S, H, gap=0):
+    """Preorder of the tree of shape q, a preorder of ranks from 1, on keys
+    S, with H[i] hanging in the gap before S[i]."""
+    if not q:
+        return H[gap]
+    r = q[0]
+    return ((S[r-1],) + _assemble([k for k in q if k < r], S, H, gap) +
+            _assemble([k for k in q if k > r], S, H, r))
+
+
+@memoize
+def _transitions(n, x):
+    """Arrays over trees of rank from 1 on 1...n: the path length to x and
+    the class of each, and the (class, tree) pairs of every tree each class
+    rebuilds into."""
+    trees, index = _trees(n)
+    classes = {}
+    cost = np.zeros(len(trees), dtype=np.int64)
+    cls = np.zeros(len(trees), dtype=np.int64)
+    for t, p in enumerate(trees):
+        S, H = _path(p, x)
+        cost[t] = len(S)
+        cls[t] = classes.setdefault((S, H), len(classes))
+    pair_class = []
+    pair_tree = []
+    for (S, H), c in classes.items():
+        for q in _trees(len(S))[0]:
+            pair_class.append(c)
+            pair_tree.append(index[_assemble(q, S, H)])
+    return cost, cls, np.array(pair_class), np.array(pair_tree)
+
+
+def opt(X, initial=None):
+    """Least cost of accessing X from the tree with preorder initial, or
+    from the best tree if initial is None, rebuilding only search paths."""
+    X = list(X)
+    keys = sorted(set(X) | set(initial or ()))
+    rank = {k: i+1 for i, k in enumerate(keys)}
+    n = len(keys)
+    if not X:
+        return 0
+    trees, index = _trees(n)
+    if initial is None:
+        dist = np.zeros(B(n))
+    else:
+        dist = np.full(B(n), np.inf)
+        dist[index[tuple(rank[k] for k in initial)]] = 0
+    for k in X:
+        cost, cls, pair_class, pair_tree = _transitions(n, rank[k])
+        best = np.full(cls.max()+1, np.inf)
+        np.minimum.at(best, cls, dist + cost)
+        dist = np.full(B(n), np.inf)
+        np.minimum.at(dist, pair_tree, best[pair_class])
+    return int(dist.min())
+
+
+def benchmark(n=9, m=40):
+    X = [randrange(n) for _ in range(m)]
+    initial = list(range(n))
+    ts = time()
+    best = opt(X, initial)
+    tm = time()
+    opt(X, initial)
+    tf = time()
+    splay = arraysim.splay_cost(X, initial)
+    print("OPT of %d accesses on %d keys: %d (%.3fs with the transitions, "
+          "%.3fs after); splay %d, ratio %.3f"
+          % (m, n, best, tm-ts, tf-tm, splay, splay/float(best)))
+
+
+class TestOfflineOpt(unittest.TestCase):
+
+    def _brute(self, X, initial):
+        """Search every rebuild of every path, access by access."""
+        dist = {tuple(initial): 0}
+        for x in X:
+            new = {}
+            for p, d in dist.items():
+                S, H = _path(p, x)
+                for q in treegen(len(S)):
+                    t = _assemble(list(q), S, H)
+                    new[t] = min(new.get(t, d + len(S)), d + len(S))
+            dist = new
+        return min(dist.values())
+
+    def test_against_brute_force(self):
+        """Test against rebuilding every path directly."""
+        seed(25)
+        for n in (1, 2, 4, 5):
+            for _ in range(4):
+                X = list(range(1, n+1)) + [randrange(1, n+1)
+                                           for _ in range(5)]
+                shuffle(X)
+                initial = list(treegen(n))[randrange(B(n))]
+                self.assertEqual(self._brute(X, initial), opt(X, initial))
+                self.assertEqual(min(self._brute(X, p) for p in treegen(n)),
+                                 opt(X))
+
+    def test_bounds(self):
+        """Test OPT against splaying and the optimal static tree."""
+        from staticbst import optimal_preorder
+        seed(26)
+        X = [randrange(7) for _ in range(30)]
+        initial = list(range(7))
+        self.assertTrue(len(X) <= opt(X, initial) <=
+                        arraysim.splay_cost(X, initial))
+        static = optimal_preorder(X)
+        self.assertTrue(opt(X) <= opt(X, static) <=
+                        arraysim.static_cost(X, static))
+        self.assertEqual(5, opt([3]*5))
+        self.assertEqual(0, opt([]))
+        # Starting from the left path, 0 costs 5 to reach
+        self.assertEqual(5 + 4, opt([0]*5, [4, 3, 2, 1, 0]))
+
+
+if __name__ == '__main__':
+    benchmark()
+    unittest.main()
@@ -1,14 +1,13 @@
 """Attempts to simulate the optimal algorithm."""
 
 from random import shuffle
-from wilber import critical_nodes
+from mrtreap import critical_nodes
 from pathcodes import Node
 
 
 def inside_nodes(s):
     """Return list of inside node sets from critical nodes."""
-    for i in range(1, len(s)+1):
-        _, _, _, v = critical_nodes(s, i)
+    for _, _, _, v in critical_nodes(s):
         yield tuple(v)
 
 
@@ -3,6 +3,8 @@
 import functools
 import unittest
 
+from snapshot import Snapshot
+
 
 def maker(maptype):
     """Turn a generator into a specified type of sequence."""
@@ -14,26 +16,14 @@ def maker(maptype):
     return outputter
 
 
-class Placeholder(object):
-    """Slot for a null node, allowing them to be linked together."""
-
-    __slots__ = ("parent_init")
-
-    def __init__(p):
-        p.parent_init = None
-
-
 class Node(object):
     """BST Node which keeps track of initial tree as nodes are inserted."""
 
-    __slots__ = ("parent", "left", "right",
-                 "parent_init", "left_init", "right_init")
+    __slots__ = ("parent", "left", "right", "initial")
 
     def __init__(x):
-        x.parent = x.parent_init = None
-        x.left = x.left_init = Placeholder()
-        x.right = x.right_init = Placeholder()
-        x.left.parent_init = x.right.parent_init = x
+        x.parent = x.left = x.right = None
+        x.initial = None  # Snapshot of the initial tree, made on first insert
 
     def rotate(x):
         """Rotate the edge between x and its parent."""
@@ -262,33 +252,13 @@ class Node(object):
         """Insert a node to the left of x."""
         if isinstance(x.left, Node):
             raise ValueError("Node already has left child")
-        p = x.left
-        x_init = p.parent_init
-        y = type(x)()
-        y.parent_init = x_init
-        if p is x_init.left_init:
-            x_init.left_init = y
-        else:
-            x_init.right_init = y
-        x.left = y
-        y.parent = x
-        return y
+        return x._initial().attach(x, type(x)(), True)
 
     def insert_right(x):
         """Insert node to right of x"""
         if isinstance(x.right, Node):
             raise ValueError("Node already has right child")
-        p = x.right
-        x_init = p.parent_init
-        y = type(x)()
-        y.parent_init = x_init
-        if p is x_init.left_init:
-            x_init.left_init = y
-        else:
-            x_init.right_init = y
-        x.right = y
-        y.parent = x
-        return y
+        return x._initial().attach(x, type(x)(), False)
 
     def decode(x, e):
         """Extend x with encoding e."""
@@ -313,14 +283,20 @@ class Node(object):
             x = x.parent
         return x
 
+    def _initial(x):
+        if x.initial is None:
+            x.initial = Snapshot(x)
+        return x.initial
+
     def reset(x):
         """Reset the tree containing x to its initial state."""
-        r = x.root()
-        for node in r.inorder():
-            node.parent = node.parent_init
-            node.left = node.left_init
-            node.right = node.right_init
-        return r.root()
+        if x.initial is None:
+            return x
+        return x.initial.restore()
+
+    def snapshot(x):
+        """Record the current shape of x's tree, for a later restore()."""
+        return Snapshot(x.root(), x._initial().family)
 
     def node_to_key(x):
         """Return a map mapping nodes to keys."""
@@ -755,6 +731,27 @@ class TestNode(unittest.TestCase):
         i.reset()
         self.assertTrue("10101010" == i.encode())
 
+    def test_snapshot(self):
+        """Test restoring a mid-run snapshot, and node size."""
+        import sys
+        [k, g, c, a, b, h, e, m, f] = _test_tree()
+        a.splay()
+        S = e.snapshot()
+        shape = a.cursor()
+        n = e.decode("0101")
+        n.splay()
+        r = S.restore()
+        self.assertTrue(r is a)
+        self.assertEqual(shape, Node.from_cursor(shape).cursor())
+        self.assertEqual(len(shape) + 8, len(r.cursor()))
+        self.assertTrue(r.is_isomorphic_to(
+            Node.from_cursor(shape).decode(e.encode() + "0101").root()))
+        self.assertTrue(k is k.reset())
+        self.assertEqual(13, len(k.inorder()))
+        x = Node()
+        self.assertTrue(x is x.reset())
+        self.assertTrue(sys.getsizeof(k) <= 72)
+
     def test_node_to_key(self):
         """Make sure node-to-key works properly."""
         [k, g, c, a, b, h, e, m, f] = _test_tree()
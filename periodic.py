@@ -0,0 +1,188 @@
+"""Fast-forward periodic access sequences.
+
+Accessing the same period s over and over, the tree at the start of each
+period is a function of the tree at the start of the previous one, so
+once a shape repeats the rest of the run is a cycle. Only the 64-bit
+hash of the shape is kept for each period. When a hash repeats, the
+candidate cycle is run once more keeping its full shapes, and once it
+closes on exactly the shape it started from, the remaining cost and the
+final shape are extrapolated instead of simulated. A hash collision costs
+a cycle of simulation but never a wrong result."""
+from __future__ import print_function
+
+import unittest
+
+from time import time
+
+import bst
+import pathcodes
+from wilber import bitReversalSequence
+
+
+def fast_forward(period, state, repeats):
+    """Run period() repeats times, each call simulating one period and
+    returning its cost, where state() describes the tree at a period
+    boundary as a hashable value. Return the total cost and the state at
+    the end, both extrapolated once a cycle of states is confirmed."""
+    seen = {}  # hash(state) -> the last period it started
+    total = 0
+    r = 0
+    while r < repeats:
+        q = state()
+        i = seen.get(hash(q))
+        seen[hash(q)] = r
+        if i is not None and 2*r - i <= repeats:
+            # Run the candidate cycle keeping its states, and check it
+            # comes back to exactly q
+            states = [q]
+            costs = [period()]
+            for _ in range(r - i - 1):
+                states.append(state())
+                seen[hash(states[-1])] = r + len(costs)
+                costs.append(period())
+            r += len(costs)
+            total += sum(costs)
+            if state() == q:
+                full, rest = divmod(repeats - r, len(costs))
+                total += full*sum(costs) + sum(costs[:rest])
+                return total, states[rest]
+            continue
+        total += period()
+        r += 1
+    return total, state()
+
+
+def bst_periodic(s, repeats, algorithm="splay", initial=None):
+    """Cost of accessing s repeats times with bst.Node's algorithm, from
+    the tree with preorder initial (empty by default), and the final tree."""
+    T = bst.Tree(initial)
+    adjust = getattr(bst.Node, algorithm)
+
+    def period():
+        cost = 0
+        for k in s:
+            x = T.find(k)
+            cost += len(x.path())
+            adjust(x)
+            T.root = x
+        return cost
+
+    total, preorder = fast_forward(period, T.preorder, repeats)
+    return total, bst.Tree(preorder)
+
+
+def pathcodes_periodic(X, repeats, optype=pathcodes.splay, cursor=None):
+    """Cost of accessing X repeats times with optype on pathcodes nodes,
+    from the tree with the given cursor movements (by default the right
+    path on the keys of X), and the root of the final tree."""
+    keys = sorted(set(X))
+    if cursor is None:
+        cursor = "r"*(len(keys)-1)
+    r = pathcodes.Node.from_cursor(cursor)
+    nodes = dict(zip(keys, r.inorder()))
+    s = [nodes[k] for k in X]
+    some = s[0] if s else r
+
+    def period():
+        cost = 0
+        for x in s:
+            cost += len(x.path())
+            optype(x)
+        return cost
+
+    total, cursor = fast_forward(period, lambda: some.root().cursor(),
+                                 repeats)
+    return total, pathcodes.Node.from_cursor(cursor)
+
+
+def benchmark(k=8, repeats=10**6):
+    s = bitReversalSequence(k)
+    ts = time()
+    cost, _ = bst_periodic(s, repeats)
+    print("%d repeats of the bit reversal of %d keys: cost %d in %.3fs"
+          % (repeats, len(s), cost, time() - ts))
+
+
+class TestPeriodic(unittest.TestCase):
+
+    def _brute(self, s, repeats, algorithm, initial=None):
+        T = bst.Tree(initial)
+        cost = 0
+        for _ in range(repeats):
+            for k in s:
+                x = T.find(k)
+                cost += len(x.path())
+                getattr(x, algorithm)()
+                T.root = x
+        return cost, T.preorder()
+
+    def test_bst(self):
+        """Test extrapolated costs and shapes against full simulation."""
+        for s, initial in ((bitReversalSequence(4), None),
+                           (list(range(10)), None),
+                           ([3, 1, 4, 1, 5, 9, 2, 6], (5, 2, 1, 3, 4, 9, 6)),
+                           ([], None)):
+            for algorithm in ("splay", "move_to_root", "simple_splay"):
+                for repeats in (0, 1, 7, 40):
+                    cost, T = bst_periodic(s, repeats, algorithm, initial)
+                    self.assertEqual(self._brute(s, repeats, algorithm,
+                                                 initial),
+                                     (cost, T.preorder()))
+
+    def test_pathcodes(self):
+        """Test pathcodes nodes fast-forward to the simulated result."""
+        X = [2, 5, 1, 4, 3]
+        for optype in (pathcodes.splay, pathcodes.move_to_root):
+            r = pathcodes.Node.from_cursor("r"*4)
+            nodes = r.inorder()
+            cost = 0
+            for _ in range(23):
+                for k in X:
+                    x = nodes[k-1]
+                    cost += len(x.path())
+                    optype(x)
+            total, root = pathcodes_periodic(X, 23, optype)
+            self.assertEqual(cost, total)
+            self.assertEqual(nodes[0].root().cursor(), root.cursor())
+
+    def _system(self, transitions):
+        """period and state of a fake tree stepping through transitions,
+        a period from x costing x, and the periods it was run."""
+        x = [0]
+        calls = []
+
+        def period():
+            calls.append(x[0])
+            cost = x[0]
+            x[0] = transitions[x[0]]
+            return cost
+
+        return period, lambda: x[0], calls
+
+    def test_cycle_detected(self):
+        """Test a long run takes only a few periods of work."""
+        period, state, calls = self._system({0: 1, 1: 2, 2: 1})
+        # States 0, 1, 2, 1, ...: costs 0, then (1, 2) 499 times and 1
+        self.assertEqual((0 + 499*(1+2) + 1, 2),
+                         fast_forward(period, state, 1000))
+        # One more period confirms the cycle (1, 2) seen twice
+        self.assertEqual([0, 1, 2, 1, 2], calls)
+        period, state, calls = self._system({0: 1, 1: 2, 2: 1})
+        self.assertEqual((0 + 1 + 2 + 1, 2), fast_forward(period, state, 4))
+
+    def test_hash_collision(self):
+        """Test colliding hashes are checked against the full states."""
+        # hash(-1) == hash(-2) in CPython, though -2 does not follow -1
+        transitions = {0: -1, -1: -2, -2: 5, 5: 6, 6: 5}
+        for repeats in (3, 4, 5, 1000, 1001):
+            period, state, calls = self._system(transitions)
+            x, cost = 0, 0
+            for _ in range(repeats):
+                cost += x
+                x = transitions[x]
+            self.assertEqual((cost, x), fast_forward(period, state, repeats))
+            self.assertTrue(len(calls) < 12)
+
+if __name__ == '__main__':
+    benchmark()
+    unittest.main()
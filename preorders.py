@@ -0,0 +1,64 @@
+"""Binary search trees from their preorders, for the array and node trees
+of arraysim, lockstep, wilber and rotdist.
+
+A preorder fixes its tree: each key is the left child of the key before
+it if smaller, and otherwise the right child of the last key on the path
+to it that it exceeds. A stack holding that path finds every parent in
+O(n) overall, where inserting the keys one at a time takes O(n^2) on a
+path."""
+from __future__ import print_function
+
+import unittest
+
+from random import randrange, seed
+
+
+def links(preorder):
+    """(key, parent, left) for every key but the root of the BST with the
+    given preorder, in preorder, left telling whether it is a left child."""
+    stack = []
+    for x in preorder:
+        if stack and x < stack[-1]:
+            yield x, stack[-1], True
+        elif stack:
+            y = stack.pop()
+            while stack and stack[-1] < x:
+                y = stack.pop()
+            yield x, y, False
+        stack.append(x)
+
+
+class TestPreorders(unittest.TestCase):
+
+    def test_against_insertion(self):
+        """Test every link against inserting the keys in preorder."""
+        seed(29)
+        for n in (0, 1, 2, 9, 60):
+            for _ in range(20):
+                keys = list(range(n))
+                order = []
+                while keys:
+                    order.append(keys.pop(randrange(len(keys))))
+                # Insertion order gives a tree; read its preorder back
+                children = {}
+                for k in order[1:]:
+                    y = order[0]
+                    while (y, k < y) in children:
+                        y = children[y, k < y]
+                    children[y, k < y] = k
+                p = []
+                stack = order[:1]
+                while stack:
+                    y = stack.pop()
+                    p.append(y)
+                    for left in (False, True):
+                        if (y, left) in children:
+                            stack.append(children[y, left])
+                self.assertEqual(sorted((k, y, left) for (y, left), k
+                                        in children.items()),
+                                 sorted(links(p)))
+        self.assertEqual([(1, 2, True), (3, 2, False)], list(links([2, 1, 3])))
+
+
+if __name__ == '__main__':
+    unittest.main()
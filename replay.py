@@ -0,0 +1,156 @@
+"""Replay one access trace under several algorithms at once.
+
+The trace is decoded once into ranks 0...n-1, placed in shared memory, and
+each worker process runs one algorithm over a view of it, so no algorithm
+rebuilds or re-reads the trace. replay() gathers the results into a single
+comparison table."""
+from __future__ import print_function
+
+import unittest
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from random import randrange, seed
+from time import time
+
+import numpy as np
+
+import arraysim
+import bst
+import geometry
+import pathcodes
+import wilber
+from topdownsplay import TDSplayTree
+
+
+def decode(trace):
+    """Return the ranks of the keys of trace as an int64 array. A string
+    is taken as the path of a file with one integer key per line."""
+    if isinstance(trace, str):
+        with open(trace) as f:
+            trace = [int(line) for line in f if line.strip()]
+    _, r = arraysim.ranks(trace)
+    return np.array(r, dtype=np.int64)
+
+
+# Algorithms, each taking a list of ranks and returning the total cost:
+# the number of nodes on the search paths, a new key included.
+
+def topdown_splay_cost(s):
+    T = TDSplayTree()
+    cost = 0
+    for k in s:
+        x = T.root
+        while x is not None:
+            cost += 1
+            if k < x.key:
+                x = x.left
+            elif k > x.key:
+                x = x.right
+            else:
+                break
+        else:
+            cost += 1
+        T.insert(k)
+    return cost
+
+
+def mr_bound(s):
+    """Zig-zags on move-to-root paths from a right path, after Kozma."""
+    return sum(pathcodes.MRBound(s))
+
+
+algorithms = {
+    "splay": arraysim.splay_cost,
+    "simple_splay": arraysim.simple_splay_cost,
+    "topdown_splay": topdown_splay_cost,
+    "move_to_root": arraysim.mr_cost,
+    "static": arraysim.static_cost,
+    "greedy": geometry.greedy_cost,
+    "mr_bound": mr_bound,
+    "wilber1": wilber.wilber1,
+}
+
+
+# Worker side
+
+_trace = None
+
+
+def _attach(name, m):
+    global _trace, _shm
+    _shm = shared_memory.SharedMemory(name=name)
+    _trace = np.ndarray((m,), dtype=np.int64, buffer=_shm.buf)
+    arraysim.splay_cost([0])  # Compile before anything is timed
+
+
+def _run(name):
+    s = _trace.tolist()
+    ts = time()
+    cost = algorithms[name](s)
+    return name, int(cost), time() - ts
+
+
+def replay(trace, names=None, workers=None):
+    """Run the named algorithms (all by default) over trace in parallel.
+
+    Return the comparison table: (algorithm, cost, cost per access,
+    seconds) rows in the order of names."""
+    if names is None:
+        names = list(algorithms)
+    for name in names:
+        if name not in algorithms:
+            raise ValueError("Unknown algorithm %r" % name)
+    r = decode(trace)
+    m = len(r)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, r.nbytes))
+    try:
+        np.ndarray((m,), dtype=np.int64, buffer=shm.buf)[:] = r
+        with ProcessPoolExecutor(workers or len(names), initializer=_attach,
+                                 initargs=(shm.name, m)) as pool:
+            results = {name: (cost, t) for name, cost, t in
+                       pool.map(_run, names)}
+    finally:
+        shm.close()
+        shm.unlink()
+    return [(name, results[name][0], results[name][0]/max(1, m),
+             results[name][1]) for name in names]
+
+
+def print_table(table):
+    print("%-14s %12s %10s %9s" % ("algorithm", "cost", "per access",
+                                   "seconds"))
+    for name, cost, per, t in table:
+        print("%-14s %12d %10.3f %9.3f" % (name, cost, per, t))
+
+
+class TestReplay(unittest.TestCase):
+
+    def test_against_serial(self):
+        """Test the parallel table agrees with the serial cost functions."""
+        seed(9)
+        s = [randrange(1000, 1030) for _ in range(300)]
+        table = replay(s, workers=2)
+        self.assertEqual(list(algorithms), [row[0] for row in table])
+        costs = {name: cost for name, cost, _, _ in table}
+        self.assertEqual(bst.splay_cost(s), costs["splay"])
+        self.assertEqual(bst.mr_cost(s), costs["move_to_root"])
+        self.assertEqual(geometry.greedy_cost(s), costs["greedy"])
+        self.assertEqual(sum(pathcodes.MRBound(s)), costs["mr_bound"])
+        self.assertEqual(wilber.wilber1(s), costs["wilber1"])
+        T = bst.Tree()
+        self.assertEqual(sum(len(T.find(k).path()) for k in s),
+                         costs["static"])
+        self.assertAlmostEqual(costs["splay"]/300., table[0][2])
+
+    def test_topdown(self):
+        """Test top-down splay counts the nodes on each search path."""
+        self.assertEqual(1+2+2+2, topdown_splay_cost([1, 2, 3, 2]))
+        with self.assertRaises(ValueError):
+            replay([1, 2], ["splay", "quicksort"])
+
+
+if __name__ == '__main__':
+    seed(1)
+    print_table(replay([randrange(2000) for _ in range(20000)]))
+    unittest.main()
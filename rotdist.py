@@ -0,0 +1,266 @@
+"""Rotation distance between two trees on the same keys.
+
+A script is a list of keys, each rotated over its parent in turn, as
+hamitonian.BST.rotate does, turning the first tree into the second.
+
+rotation_distance is exact: a bidirectional breadth first search over
+trees encoded by their treerank rank, growing the smaller frontier a level
+at a time. It is practical up to about a dozen keys.
+
+approximate_distance returns the shortest of three scripts, each found in
+O(n) plus its length: through the right path and through the left path,
+both at most 2n - 2 long, and lifting each key of the target in preorder
+to its place, which keeps every subtree the two trees already share and is
+abandoned once it grows past 2n - 2. Trees are built from their preorders
+with a stack, so the whole takes O(n)."""
+from __future__ import print_function
+
+import unittest
+
+from random import seed
+from time import time
+
+from hamitonian import BST
+from preorders import links
+from randombst import good_random_bst, preorder
+from treerank import irank, rank
+
+
+def tree(p):
+    """hamitonian.BST with preorder p, built in O(n)."""
+    T = BST()
+    if len(p):
+        T.root = T._new_node(p[0], None)
+    for k, parent, left in links(p):
+        y = T[parent]
+        if left:
+            y.left = T._new_node(k, y)
+        else:
+            y.right = T._new_node(k, y)
+    return T
+
+
+def _preorder(T):
+    """Preorder of T, without recursing down long paths."""
+    order = []
+    stack = [T.root]
+    while stack:
+        x = stack.pop()
+        if x is not None:
+            order.append(x.value)
+            stack.append(x.right)
+            stack.append(x.left)
+    return tuple(order)
+
+
+def replay(p, script):
+    """Preorder of the tree with preorder p after rotating script."""
+    T = tree(p)
+    for k in script:
+        T.rotate(k)
+    return _preorder(T)
+
+
+def _neighbours(p):
+    """(key, parent, preorder after) for every rotation of a key over its
+    parent in the tree with preorder p."""
+    T = tree(p)
+    for k in p[1:]:
+        u = T[k].parent.value
+        T.rotate(k)
+        yield k, u, T.preorder()
+        T.rotate(u)
+
+
+def rotation_distance(source, target):
+    """Least number of rotations from the tree with preorder source to the
+    tree with preorder target, and a script of them."""
+    source, target = tuple(source), tuple(target)
+    keys = sorted(source)
+    assert keys == sorted(target)
+    n = len(keys)
+    # Each side maps the ranks it reached to (rank before, key rotated,
+    # its parent), with None at its start
+    start, goal = rank(source), rank(target)
+    if start == goal:
+        return 0, []
+    seen = ({start: None}, {goal: None})
+    frontier = ([start], [goal])
+    while True:
+        side = 0 if len(frontier[0]) <= len(frontier[1]) else 1
+        here, there = seen[side], seen[1-side]
+        met = None
+        grown = []
+        for r in frontier[side]:
+            p = tuple(keys[i-1] for i in irank(r, n))
+            for k, u, q in _neighbours(p):
+                s = rank(q)
+                if s in here:
+                    continue
+                here[s] = (r, k, u)
+                grown.append(s)
+                if s in there and (met is None or
+                                   _depth(there, s) < _depth(there, met)):
+                    met = s
+        frontier[side][:] = grown
+        if met is not None:
+            break
+    # Forwards from the source to where the searches met, then the
+    # target's side undone in reverse
+    script = []
+    r = met
+    while seen[0][r] is not None:
+        r, k, _ = seen[0][r]
+        script.append(k)
+    script.reverse()
+    r = met
+    while seen[1][r] is not None:
+        r, _, u = seen[1][r]
+        script.append(u)
+    return len(script), script
+
+
+def _depth(seen, r):
+    d = 0
+    while seen[r] is not None:
+        r = seen[r][0]
+        d += 1
+    return d
+
+
+def _to_path(T, right=True):
+    """Rotate T into a right (or left) path, returning the rotations as
+    (key, parent) pairs."""
+    rotations = []
+    x = T.root
+    while x is not None:
+        c = x.left if right else x.right
+        if c is None:
+            x = x.right if right else x.left
+        else:
+            rotations.append((c.value, x.value))
+            T.rotate(c.value)
+            x = c
+    return rotations
+
+
+def _inside(k, lo, hi):
+    """Is k in the open interval (lo, hi), None being unbounded?"""
+    return (lo is None or lo < k) and (hi is None or k < hi)
+
+
+def _lift(T, target, cap):
+    """Rotate each key of target, in preorder, up to the root of its
+    subtree's key interval in T, or give up with None once past cap
+    rotations."""
+    script = []
+    stack = []  # (key, low, high) of the target ancestors
+    for k in target:
+        while stack and not _inside(k, stack[-1][1], stack[-1][2]):
+            stack.pop()
+        lo = hi = None
+        if stack:
+            y, lo, hi = stack[-1]
+            if k < y:
+                hi = y
+            else:
+                lo = y
+        x = T[k]
+        while x.parent is not None and _inside(x.parent.value, lo, hi):
+            if len(script) == cap:
+                return None
+            script.append(k)
+            T.rotate(k)
+        stack.append((k, lo, hi))
+    return script
+
+
+def approximate_distance(source, target):
+    """Number of rotations in a short script from the tree with preorder
+    source to the tree with preorder target, and the script."""
+    source, target = tuple(source), tuple(target)
+    assert len(source) == len(target) and set(source) == set(target)
+    cap = max(0, 2*len(source) - 2)
+    scripts = []
+    lifted = _lift(tree(source), target, cap)
+    if lifted is not None:
+        scripts.append(lifted)
+    for right in (True, False):
+        there = [k for k, _ in _to_path(tree(source), right)]
+        back = [u for _, u in reversed(_to_path(tree(target), right))]
+        scripts.append(there + back)
+    script = min(scripts, key=len)
+    return len(script), script
+
+
+def benchmark(n=10**4, paths=10**5):
+    s, t = preorder(good_random_bst(n)), preorder(good_random_bst(n))
+    ts = time()
+    d, script = approximate_distance(s, t)
+    print("%d keys: %d rotations (2n - 2 = %d) in %.3fs"
+          % (n, d, 2*n-2, time() - ts))
+    path = tuple(range(paths))
+    ts = time()
+    d, script = approximate_distance(path, path[::-1])
+    print("right path to left path on %d keys: %d rotations in %.3fs"
+          % (paths, d, time() - ts))
+    s, t = preorder(good_random_bst(9)), preorder(good_random_bst(9))
+    ts = time()
+    d, _ = rotation_distance(s, t)
+    print("9 keys: distance %d in %.3fs, approximation %d"
+          % (d, time() - ts, approximate_distance(s, t)[0]))
+
+
+class TestRotationDistance(unittest.TestCase):
+
+    def _brute(self, source, target):
+        """Distance by breadth first search from the source alone."""
+        level = {tuple(source)}
+        seen = set(level)
+        d = 0
+        while tuple(target) not in level:
+            level = {q for p in level for _, _, q in _neighbours(p)} - seen
+            seen |= level
+            d += 1
+        return d
+
+    def test_exact(self):
+        """Test distances and scripts against a one-sided search."""
+        from treerank import treegen
+        trees = list(treegen(5))
+        for s in trees[::3]:
+            for t in trees[::2]:
+                d, script = rotation_distance(s, t)
+                self.assertEqual(self._brute(s, t), d)
+                self.assertEqual(tuple(t), replay(s, script))
+        # The right and left paths are n - 1 apart
+        self.assertEqual(3, rotation_distance((1, 2, 3, 4),
+                                              (4, 3, 2, 1))[0])
+        self.assertEqual((0, []), rotation_distance((2, 1, 3), (2, 1, 3)))
+
+    def test_approximate(self):
+        """Test approximate scripts replay, and bound the exact distance."""
+        seed(27)
+        for n in (1, 2, 7, 60):
+            s = preorder(good_random_bst(n))
+            t = preorder(good_random_bst(n))
+            d, script = approximate_distance(s, t)
+            self.assertEqual(tuple(t), replay(s, script))
+            self.assertTrue(d <= max(0, 2*n-2))
+            if n <= 7:
+                self.assertTrue(rotation_distance(s, t)[0] <= d)
+        # Paths build in linear time, and lifting gives up past 2n - 2
+        n = 5000
+        path = tuple(range(n))
+        self.assertEqual(path, _preorder(tree(path)))
+        self.assertEqual(n-1, approximate_distance(path, path[::-1])[0])
+        self.assertEqual(None, _lift(tree(path), (n//2,) + path[:n//2] +
+                                     path[n//2+1:], 10))
+        # Lifting keeps a shared root and rotates only below it
+        self.assertEqual((1, [1]), approximate_distance((3, 2, 1, 4),
+                                                        (3, 1, 2, 4)))
+
+
+if __name__ == '__main__':
+    benchmark()
+    unittest.main()
@@ -2,11 +2,12 @@
 from __future__ import print_function
 
 from pathcodes import Node
+from rotdist import rotation_distance
 
 
 def printFinal(keys):
     """Start from 1-2-3-4, print final splay and move-to-root tree preorders
-    after splaying keys."""
+    after splaying keys, and the rotation distance between them."""
     sp = Node.from_cursor("rrr")
     spKeyToNode = sp.key_to_node()
     mr = Node.from_cursor("rrr")
@@ -16,6 +17,8 @@ def printFinal(keys):
         mrKeyToNode[k].move_to_root()
     print(sp.root().numbered_preorder())
     print(mr.root().numbered_preorder())
+    print(rotation_distance(sp.root().numbered_preorder(),
+                            mr.root().numbered_preorder())[0])
 
 print("A")
 printFinal([3,1,4,1])
@@ -0,0 +1,133 @@
+"""Compact record of a binary tree's shape, restorable in O(n) time.
+
+Shared by bst.Node and pathcodes.Node: nodes need only parent, left, right
+and initial slots, with None for an empty child."""
+import unittest
+
+from weakref import WeakSet
+
+
+class Snapshot(object):
+    """Shape of a tree at one moment, kept as its nodes in preorder and two
+    child bits per node.
+
+    Every live snapshot of a tree is in the shared set family. A node
+    inserted after a snapshot was taken is logged on it together with the
+    two neighbours whose gap it filled, so restore() can put it back in
+    that gap. Once a snapshot is gone, nothing is logged for it."""
+
+    __slots__ = ("nodes", "shape", "inserts", "family", "__weakref__")
+
+    def __init__(s, root, family=None):
+        s.family = WeakSet() if family is None else family
+        s.family.add(s)
+        s.capture(root)
+
+    def capture(s, root):
+        """Record the current shape of the tree rooted at root."""
+        nodes = []
+        shape = bytearray()
+        stack = [root]
+        while stack:
+            x = stack.pop()
+            nodes.append(x)
+            l = x.left
+            r = x.right
+            shape.append((l is not None) + 2*(r is not None))
+            if r is not None:
+                stack.append(r)
+            if l is not None:
+                stack.append(l)
+        s.nodes = nodes
+        s.shape = shape
+        s.inserts = []
+
+    def attach(s, x, y, left):
+        """Make the new node y a child of x, logging its neighbours."""
+        y.initial = s
+        y.parent = x
+        z = x
+        if left:
+            x.left = y
+            while z.parent is not None and z is z.parent.left:
+                z = z.parent
+            entry = (y, z.parent, x)
+        else:
+            x.right = y
+            while z.parent is not None and z is z.parent.right:
+                z = z.parent
+            entry = (y, x, z.parent)
+        for t in s.family:
+            t.inserts.extend(entry)
+        return y
+
+    def restore(s):
+        """Put the tree back in the recorded shape, in O(n), and return its
+        root. A node inserted since goes back in the gap it was inserted
+        into."""
+        p = None
+        left = True
+        stack = []
+        for x, b in zip(s.nodes, s.shape):
+            x.parent = p
+            if p is not None:
+                if left:
+                    p.left = x
+                else:
+                    p.right = x
+            x.left = x.right = None
+            if b & 2:
+                stack.append(x)
+            if b & 1:
+                p, left = x, True
+            elif stack:
+                p, left = stack.pop(), False
+        inserts = s.inserts
+        for i in range(0, len(inserts), 3):
+            y, a, b = inserts[i:i+3]
+            y.left = y.right = None
+            if a is not None and a.right is None:
+                a.right = y
+                y.parent = a
+            else:
+                b.left = y
+                y.parent = b
+        root = s.nodes[0]
+        if inserts:
+            s.capture(root)
+        return root
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def test_shape_bits(self):
+        """Test the preorder and child bits recorded for a small tree."""
+        from bst import Tree
+        T = Tree("dbfaceg")
+        S = T.snapshot()
+        self.assertEqual("dbacfeg", "".join(x.key for x in S.nodes))
+        self.assertEqual(bytearray([3, 3, 0, 0, 3, 0, 0]), S.shape)
+        T.splay("a")
+        T.splay("h")
+        T.splay("bb")
+        T.restore(S)
+        self.assertEqual(("d", "b", "a", "c", "bb", "f", "e", "g", "h"),
+                         T.preorder())
+        self.assertEqual([], S.inserts)
+
+    def test_dropped_snapshots(self):
+        """Test inserts stop being logged once a snapshot is discarded."""
+        from bst import Tree
+        T = Tree(range(10))
+        S = T.snapshot()
+        T.splay(10)
+        self.assertEqual(3, len(S.inserts))
+        self.assertEqual(2, len(S.family))
+        del S
+        T.splay(11)
+        self.assertEqual(1, len(T.root.initial.family))
+        self.assertEqual(6, len(T.root.initial.inserts))
+
+
+if __name__ == '__main__':
+    unittest.main()
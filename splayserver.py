@@ -0,0 +1,286 @@
+"""Serve a shared TDSplayTree of 64-bit integer keys over localhost TCP or a
+Unix socket, with pipelined requests in a compact binary framing.
+
+Every frame is a header (op: uint8, n: uint32) followed by n little-endian
+int64 keys. INSERT and CONTAINS frames carry a batch of keys, which the
+server applies in key order so that consecutive splays stay close together.
+RANGE carries (lo, hi) and answers with the keys in [lo, hi). Responses come
+back in request order: CONTAINS with n bytes of 0/1, INSERT with no payload,
+RANGE with n keys."""
+from __future__ import print_function
+
+import asyncio
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from collections import deque
+from random import randrange, seed
+from time import perf_counter
+
+from topdownsplay import LUB, TDSplayTree
+
+
+HEADER = struct.Struct("<BI")
+INSERT = 1
+CONTAINS = 2
+RANGE = 3
+
+
+def _keys(n):
+    return struct.Struct("<%dq" % n)
+
+
+def encode(op, keys):
+    """Encode a frame with the given op and keys."""
+    return HEADER.pack(op, len(keys)) + _keys(len(keys)).pack(*keys)
+
+
+def key_range(T, lo, hi):
+    """Return keys k of T with lo <= k < hi, found by successive splays."""
+    keys = []
+    if not T or not lo < hi:
+        return keys
+    T.splay(lo)
+    k = T.root.key
+    if k < lo:
+        T.splay(LUB(k))
+        k = T.root.key
+    while lo <= k < hi:
+        keys.append(k)
+        T.splay(LUB(k))
+        if T.root.key == k:
+            break
+        k = T.root.key
+    return keys
+
+
+def _apply(T, op, keys):
+    """Apply one request frame to T and return the response frame."""
+    n = len(keys)
+    order = sorted(range(n), key=keys.__getitem__)
+    if op == INSERT:
+        for i in order:
+            T.insert(keys[i])
+        return HEADER.pack(INSERT, n)
+    elif op == CONTAINS:
+        found = bytearray(n)
+        for i in order:
+            found[i] = keys[i] in T
+        return HEADER.pack(CONTAINS, n) + bytes(found)
+    elif op == RANGE:
+        if n != 2:
+            raise ValueError("RANGE takes exactly two keys")
+        r = key_range(T, *keys)
+        return encode(RANGE, r)
+    raise ValueError("Unknown op %r" % op)
+
+
+async def _handle(T, reader, writer):
+    try:
+        while True:
+            op, n = HEADER.unpack(await reader.readexactly(HEADER.size))
+            keys = _keys(n).unpack(await reader.readexactly(8*n))
+            writer.write(_apply(T, op, keys))
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass  # Client hung up, or sent a malformed frame
+    finally:
+        writer.close()
+
+
+async def start_server(T=None, host="127.0.0.1", port=0, path=None):
+    """Serve T (a new TDSplayTree by default) on a Unix socket at path, or
+    else on host and port."""
+    if T is None:
+        T = TDSplayTree()
+
+    def handler(reader, writer):
+        return _handle(T, reader, writer)
+
+    if path is not None:
+        return await asyncio.start_unix_server(handler, path)
+    return await asyncio.start_server(handler, host, port)
+
+
+class SplayClient(object):
+    """Pipelining client: requests may be issued without awaiting earlier
+    ones, and responses are matched up in order."""
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._pending = deque()
+        self._task = asyncio.ensure_future(self._read())
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=None, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    def _send(self, op, keys):
+        self._writer.write(encode(op, keys))
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(future)
+        return future
+
+    async def _read(self):
+        reader = self._reader
+        try:
+            while True:
+                op, n = HEADER.unpack(await reader.readexactly(HEADER.size))
+                if op == CONTAINS:
+                    result = [bool(b) for b in await reader.readexactly(n)]
+                elif op == RANGE:
+                    result = list(_keys(n).unpack(
+                        await reader.readexactly(8*n)))
+                else:
+                    result = n
+                self._pending.popleft().set_result(result)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            while self._pending:
+                self._pending.popleft().set_exception(ConnectionError(e))
+
+    def insert(self, keys):
+        return self._send(INSERT, list(keys))
+
+    def contains(self, keys):
+        return self._send(CONTAINS, list(keys))
+
+    def range(self, lo, hi):
+        return self._send(RANGE, [lo, hi])
+
+    async def close(self):
+        self._writer.close()
+        await self._task
+
+
+# Load generation
+
+async def generate_load(client, requests=10000, batch=16, depth=64,
+                        keys=10**6, inserts=0.2):
+    """Pipeline requests with at most depth in flight. Return requests per
+    second and the sorted request latencies in seconds."""
+    latencies = []
+    window = asyncio.Semaphore(depth)
+
+    async def timed(future, start):
+        await future
+        latencies.append(perf_counter() - start)
+        window.release()
+
+    tasks = []
+    start = perf_counter()
+    for _ in range(requests):
+        await window.acquire()
+        b = [randrange(keys) for _ in range(batch)]
+        if randrange(1000) < 1000*inserts:
+            future = client.insert(b)
+        else:
+            future = client.contains(b)
+        tasks.append(asyncio.ensure_future(timed(future, perf_counter())))
+    await asyncio.gather(*tasks)
+    elapsed = perf_counter() - start
+    latencies.sort()
+    return requests/elapsed, latencies
+
+
+def run_load(requests=20000, batch=16, depth=64, path=None):
+    """Start a server, drive it with generate_load and print the results."""
+    async def main():
+        server = await start_server(path=path)
+        if path is None:
+            port = server.sockets[0].getsockname()[1]
+            client = await SplayClient.connect(port=port)
+        else:
+            client = await SplayClient.connect(path=path)
+        rate, lat = await generate_load(client, requests, batch, depth)
+        await client.close()
+        server.close()
+        await server.wait_closed()
+        return rate, lat
+    rate, lat = asyncio.run(main())
+    print("%.0f requests/s (%.0f keys/s)" % (rate, rate*batch))
+    for q in (0.5, 0.9, 0.99):
+        print("p%d latency: %.3f ms" % (100*q, 1000*lat[int(q*(len(lat)-1))]))
+
+
+class TestSplayServer(unittest.TestCase):
+
+    def test_key_range(self):
+        """Test range scans by successive splaying."""
+        T = TDSplayTree(range(0, 100, 3))
+        self.assertEqual([12, 15, 18], key_range(T, 10, 20))
+        self.assertEqual([12, 15, 18], key_range(T, 12, 19))
+        self.assertEqual([96, 99], key_range(T, 95, 1000))
+        self.assertEqual([], key_range(T, 100, 1000))
+        self.assertEqual([], key_range(T, 20, 10))
+        self.assertEqual([], key_range(TDSplayTree(), 0, 10))
+        self.assertEqual(list(range(0, 100, 3)), key_range(T, -5, 100))
+
+    def _session(self, path=None):
+        seed(7)
+
+        async def main():
+            T = TDSplayTree()
+            server = await start_server(T, path=path)
+            if path is None:
+                port = server.sockets[0].getsockname()[1]
+                client = await SplayClient.connect(port=port)
+            else:
+                client = await SplayClient.connect(path=path)
+            keys = [randrange(1000) for _ in range(300)]
+            # Pipelined: nothing awaited until every request is sent
+            futures = [client.insert(keys[i:i+30])
+                       for i in range(0, 300, 30)]
+            probe = client.contains([keys[0], -1, keys[-1], 5000])
+            scan = client.range(100, 200)
+            counts = await asyncio.gather(*futures)
+            result = (counts, await probe, await scan, list(T))
+            await client.close()
+            server.close()
+            await server.wait_closed()
+            return keys, result
+
+        keys, (counts, probe, scan, contents) = asyncio.run(main())
+        self.assertEqual([30]*10, counts)
+        self.assertEqual([True, False, True, False], probe)
+        self.assertEqual(sorted(k for k in set(keys) if 100 <= k < 200), scan)
+        self.assertEqual(sorted(set(keys)), contents)
+
+    def test_tcp(self):
+        """Test a pipelined session over localhost TCP."""
+        self._session()
+
+    def test_unix_socket(self):
+        """Test a pipelined session over a Unix socket."""
+        d = tempfile.mkdtemp()
+        try:
+            self._session(os.path.join(d, "splay.sock"))
+        finally:
+            shutil.rmtree(d)
+
+    def test_load_generator(self):
+        """Test the load generator completes and times every request."""
+        async def main():
+            server = await start_server()
+            port = server.sockets[0].getsockname()[1]
+            client = await SplayClient.connect(port=port)
+            rate, lat = await generate_load(client, 200, 8, 16, 1000)
+            await client.close()
+            server.close()
+            await server.wait_closed()
+            return rate, lat
+        rate, lat = asyncio.run(main())
+        self.assertEqual(200, len(lat))
+        self.assertTrue(rate > 0)
+
+
+if __name__ == '__main__':
+    run_load()
+    unittest.main()
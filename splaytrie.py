@@ -0,0 +1,312 @@
+"""Ternary search trie whose character levels are top-down splay trees, so
+hot prefixes rise to the top of every level they pass through."""
+from __future__ import print_function
+
+import unittest
+
+from random import choice, randrange, seed
+from time import time
+
+from topdownsplay import BinaryNode, TDSplayTree
+
+
+class TrieNode(BinaryNode):
+    """Character node: left and right stay on the level, eq goes deeper."""
+
+    __slots__ = ("eq", "terminal")
+
+    def __init__(self, key):
+        super(TrieNode, self).__init__(key)
+        self.eq = None
+        self.terminal = False
+
+
+class SplayTrie(object):
+    """Set of strings stored as a ternary search trie of splay trees."""
+
+    __slots__ = ("root", "header", "empty", "size")
+
+    def __init__(self, iterable=None):
+        self.root = None
+        self.header = BinaryNode(None)
+        self.empty = False  # Whether the empty string is in the set
+        self.size = 0
+        if iterable is not None:
+            for s in iterable:
+                self.insert(s)
+
+    def __repr__(self):
+        return "%s(%s)" % (self.__class__.__name__, list(self))
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return self.size > 0
+
+    __nonzero__ = __bool__
+
+    def _splay(self, t, c):
+        """Simple top-down splay of the level rooted at t; return new root."""
+        l = r = self.header
+        self.header.left = self.header.right = None
+        while True:
+            if c < t.key:
+                if t.left is None:
+                    break
+                if c < t.left.key:
+                    y = t.left  # Rotate right
+                    t.left = y.right
+                    y.right = t
+                    t = y
+                    if t.left is None:
+                        break
+                r.left = t  # Link right
+                r = t
+                t = t.left
+            elif c > t.key:
+                if t.right is None:
+                    break
+                if c > t.right.key:
+                    y = t.right  # rotate left
+                    t.right = y.left
+                    y.left = t
+                    t = y
+                    if t.right is None:
+                        break
+                l.right = t  # link left
+                l = t
+                t = t.right
+            else:
+                break
+        l.right = t.left  # assemble
+        r.left = t.right
+        t.left = self.header.right
+        t.right = self.header.left
+        return t
+
+    def _walk(self, s):
+        """Splay down the levels spelling s. Yield the node matched by each
+        character, stopping at the first character that is missing."""
+        parent = None
+        t = self.root
+        for c in s:
+            if t is None:
+                return
+            t = self._splay(t, c)
+            if parent is None:
+                self.root = t
+            else:
+                parent.eq = t
+            if t.key != c:
+                return
+            yield t
+            parent = t
+            t = t.eq
+
+    def _find(self, s):
+        """Return the node at the end of the path spelling s, if any."""
+        x = None
+        i = 0
+        for i, x in enumerate(self._walk(s), start=1):
+            pass
+        return x if i == len(s) else None
+
+    def insert(self, s):
+        """Insert string s into the trie."""
+        if not s:
+            if not self.empty:
+                self.empty = True
+                self.size += 1
+            return
+        parent = None
+        i = 0
+        for i, parent in enumerate(self._walk(s), start=1):
+            pass
+        if parent is not None and i == len(s):
+            if not parent.terminal:
+                parent.terminal = True
+                self.size += 1
+            return
+        # The level holding s[i] has been splayed, so hang the new node at
+        # its root the same way ABCSplay.insert does.
+        t = self.root if parent is None else parent.eq
+        n = TrieNode(s[i])
+        if t is not None:
+            if n.key < t.key:
+                n.left = t.left
+                n.right = t
+                t.left = None
+            else:
+                n.right = t.right
+                n.left = t
+                t.right = None
+        if parent is None:
+            self.root = n
+        else:
+            parent.eq = n
+        for c in s[i+1:]:
+            n.eq = TrieNode(c)
+            n = n.eq
+        n.terminal = True
+        self.size += 1
+
+    def __contains__(self, s):
+        """Test membership, splaying every level on the search path."""
+        if not s:
+            return self.empty
+        x = self._find(s)
+        return x is not None and x.terminal
+
+    def _subtrie(self, prefix, t):
+        """Yield keys under the level rooted at t in symmetric order."""
+        stack = [(t, prefix, False)]
+        while stack:
+            x, p, expanded = stack.pop()
+            if x is None:
+                continue
+            if expanded:
+                # Left level subtree has been emitted; now x and below.
+                if x.terminal:
+                    yield p + x.key
+                stack.append((x.right, p, False))
+                stack.append((x.eq, p + x.key, False))
+            else:
+                stack.append((x, p, True))
+                stack.append((x.left, p, False))
+
+    def prefix_scan(self, prefix=""):
+        """Yield the keys beginning with prefix in sorted order."""
+        if not prefix:
+            if self.empty:
+                yield ""
+            for s in self._subtrie("", self.root):
+                yield s
+            return
+        x = self._find(prefix)
+        if x is None:
+            return
+        if x.terminal:
+            yield prefix
+        for s in self._subtrie(prefix, x.eq):
+            yield s
+
+    def __iter__(self):
+        return self.prefix_scan()
+
+    def longest_prefix(self, s):
+        """Return the longest key in the trie which is a prefix of s."""
+        best = 0 if self.empty else None
+        for i, x in enumerate(self._walk(s), start=1):
+            if x.terminal:
+                best = i
+        if best is None:
+            raise KeyError("No key is a prefix of %r" % (s, ))
+        return s[:best]
+
+
+# Benchmarks
+
+def url_keys(n, hosts=20, depth=4):
+    """Random URL-like keys sharing long scheme and host prefixes."""
+    words = ["api", "static", "user", "v1", "v2", "images", "search",
+             "account", "settings", "orders", "items", "docs"]
+    hostnames = ["https://www.%s-example.com/" % "".join(
+        choice("abcdefghijklmnopqrstuvwxyz") for _ in range(8))
+        for _ in range(hosts)]
+    keys = set()
+    while len(keys) < n:
+        path = "/".join(choice(words) for _ in range(randrange(1, depth+1)))
+        keys.add("%s%s/%d" % (choice(hostnames), path, randrange(1000)))
+    return list(keys)
+
+
+def benchmark(n=20000, m=100000):
+    """Time inserts and skewed lookups against TDSplayTree on URL keys."""
+    keys = url_keys(n)
+    hot = keys[:n//100 or 1]
+    lookups = [choice(hot) if randrange(4) else choice(keys)
+               for _ in range(m)]
+    for cls in (SplayTrie, TDSplayTree):
+        ts = time()
+        T = cls(keys)
+        tm = time()
+        for s in lookups:
+            s in T
+        tf = time()
+        print("%s: insert %.3fs, lookup %.3fs" % (cls.__name__, tm-ts, tf-tm))
+
+
+class TestSplayTrie(unittest.TestCase):
+
+    def test_insert_and_contains(self):
+        """Test membership agrees with a set."""
+        seed(3)
+        keys = url_keys(300, hosts=3)
+        T = SplayTrie(keys[:200])
+        self.assertEqual(200, len(T))
+        for s in keys[:200]:
+            self.assertIn(s, T)
+        for s in keys[200:]:
+            self.assertNotIn(s, T)
+        for s in keys[:200]:
+            T.insert(s)
+        self.assertEqual(200, len(T))
+        self.assertNotIn("", T)
+        self.assertNotIn("https", T)
+        T.insert("")
+        self.assertIn("", T)
+        self.assertEqual(201, len(T))
+        self.assertFalse(SplayTrie())
+        self.assertNotIn("a", SplayTrie())
+
+    def test_prefix_keys(self):
+        """Test keys that are prefixes of one another."""
+        T = SplayTrie(["abc", "ab", "abcd", "b", "a"])
+        self.assertEqual(["a", "ab", "abc", "abcd", "b"], list(T))
+        self.assertIn("ab", T)
+        self.assertNotIn("abd", T)
+        T.insert("abd")
+        self.assertEqual(["a", "ab", "abc", "abcd", "abd", "b"], list(T))
+
+    def test_prefix_scan(self):
+        """Test prefix scans are sorted and complete."""
+        seed(5)
+        keys = url_keys(500, hosts=4)
+        T = SplayTrie(keys)
+        self.assertEqual(sorted(keys), list(T))
+        for s in keys[:50]:
+            for k in (10, 25, 30, len(s)):
+                p = s[:k]
+                expected = sorted(x for x in keys if x.startswith(p))
+                self.assertEqual(expected, list(T.prefix_scan(p)))
+        self.assertEqual([], list(T.prefix_scan("ftp://")))
+
+    def test_longest_prefix(self):
+        """Test longest-prefix matching."""
+        T = SplayTrie(["http://a.com/", "http://a.com/x/", "http://b.com/"])
+        self.assertEqual("http://a.com/x/",
+                         T.longest_prefix("http://a.com/x/y"))
+        self.assertEqual("http://a.com/", T.longest_prefix("http://a.com/y"))
+        self.assertEqual("http://b.com/", T.longest_prefix("http://b.com/"))
+        with self.assertRaises(KeyError):
+            T.longest_prefix("http://c.com/")
+        T.insert("")
+        self.assertEqual("", T.longest_prefix("http://c.com/"))
+
+    def test_levels_are_splayed(self):
+        """Test an accessed key sits at the root of every level on its path."""
+        T = SplayTrie(["cat", "car", "dog", "cow", "ant", "cap"])
+        "cow" in T
+        self.assertEqual("c", T.root.key)
+        self.assertEqual("o", T.root.eq.key)
+        "cap" in T
+        self.assertEqual("a", T.root.eq.key)
+        self.assertEqual("p", T.root.eq.eq.key)
+        "ant" in T
+        self.assertEqual("a", T.root.key)
+
+
+if __name__ == '__main__':
+    benchmark()
+    unittest.main()
@@ -0,0 +1,190 @@
+"""Optimal and nearly optimal static trees for an access sequence.
+
+The cost of a static tree on a trace is the sum over accesses of the depth
+of the key accessed, the root having depth 1, so only the number of
+accesses of each key matters. Knuth's dynamic program finds the best tree
+in O(n^2), since the best root of a range of keys lies between the best
+roots of the range less its last and less its first key. Mehlhorn's
+bisection roots each range at the key whose weight straddles the middle of
+the range's weight, in O(log n) per key by binary search over prefix
+sums; each key then lies at depth at most log2(W/w) + 1 for w its weight
+and W the total, within a constant of the entropy bound.
+
+Both give a preorder of keys that bst.Tree, arraysim and lockstep can load,
+and static_costs sets the cost of the trace on each beside splaying."""
+from __future__ import print_function
+
+import unittest
+
+from bisect import bisect_right
+from collections import Counter
+from math import log
+from random import randrange, seed
+from time import time
+
+import numpy as np
+
+import arraysim
+from arraysim import jit
+
+
+def weights(X):
+    """Sorted keys and their weights, from a {key: weight} mapping or the
+    number of accesses of each key in the trace X."""
+    if not hasattr(X, "items"):
+        X = Counter(X)
+    keys = sorted(X)
+    return keys, [X[k] for k in keys]
+
+
+@jit
+def _knuth(w, cost, root):
+    """Fill cost[i, j] with the least weighted path length of ranks
+    i...j-1, and root[i, j] with the rank at the root of a best tree."""
+    n = len(w)
+    prefix = np.zeros(n+1)
+    for i in range(n):
+        prefix[i+1] = prefix[i] + w[i]
+    for i in range(n):
+        cost[i, i+1] = w[i]
+        root[i, i+1] = i
+    for d in range(2, n+1):
+        for i in range(n-d+1):
+            j = i + d
+            best = np.inf
+            for r in range(root[i, j-1], root[i+1, j] + 1):
+                c = cost[i, r] + cost[r+1, j]
+                if c < best:
+                    best = c
+                    root[i, j] = r
+            cost[i, j] = best + prefix[j] - prefix[i]
+
+
+def _preorder(keys, root_of):
+    """Preorder of keys in the tree rooting each range of ranks [i, j) at
+    root_of(i, j)."""
+    order = []
+    stack = [(0, len(keys))]
+    while stack:
+        i, j = stack.pop()
+        if i < j:
+            r = root_of(i, j)
+            order.append(keys[r])
+            stack.append((r+1, j))
+            stack.append((i, r))
+    return order
+
+
+def optimal_preorder(X):
+    """Preorder of the static tree of least cost on the trace X, or for the
+    {key: weight} mapping X, by Knuth's O(n^2) dynamic program."""
+    keys, w = weights(X)
+    n = len(keys)
+    if not n:
+        return []
+    cost = np.zeros((n+1, n+1))
+    root = np.zeros((n+1, n+1), dtype=np.int64)
+    _knuth(np.asarray(w, dtype=np.float64), cost, root)
+    return _preorder(keys, lambda i, j: root[i, j])
+
+
+def mehlhorn_preorder(X):
+    """Preorder of Mehlhorn's bisection tree for the trace X, or for the
+    {key: weight} mapping X, in O(n log n)."""
+    keys, w = weights(X)
+    prefix = [0]
+    for v in w:
+        prefix.append(prefix[-1] + v)
+
+    def root_of(i, j):
+        # The key whose weight covers the middle of the range
+        r = bisect_right(prefix, (prefix[i] + prefix[j]) / 2.0, i, j) - 1
+        return min(max(r, i), j-1)
+
+    return _preorder(keys, root_of)
+
+
+def static_costs(X):
+    """{tree: cost of the trace X} for the optimal and Mehlhorn static
+    trees, with the cost of splaying X from the empty tree under "splay"."""
+    X = list(X)
+    if not X:
+        return {"optimal": 0, "mehlhorn": 0, "splay": 0}
+    return {"optimal": arraysim.static_cost(X, optimal_preorder(X)),
+            "mehlhorn": arraysim.static_cost(X, mehlhorn_preorder(X)),
+            "splay": arraysim.splay_cost(X)}
+
+
+def entropy(X):
+    """m times the entropy of the access frequencies of the trace X."""
+    keys, w = weights(X)
+    m = float(sum(w))
+    return sum(v*log(m/v, 2) for v in w)
+
+
+def benchmark(n=2000, m=10**5):
+    # Zipf-like trace: key k is accessed about m/(k+1)/H_n times
+    z = np.cumsum(1.0/np.arange(1, n+1))
+    X = np.searchsorted(z, np.random.random(m)*z[-1]).tolist()
+    for name, build in (("optimal", optimal_preorder),
+                        ("mehlhorn", mehlhorn_preorder)):
+        ts = time()
+        build(X)
+        print("%s tree on %d keys in %.3fs" % (name, n, time() - ts))
+    costs = static_costs(X)
+    print("entropy %.0f, " % entropy(X) +
+          ", ".join("%s %d" % (k, costs[k])
+                    for k in ("optimal", "mehlhorn", "splay")))
+
+
+class TestStaticBST(unittest.TestCase):
+
+    def _brute(self, w):
+        """Least weighted path length over every tree on weights w."""
+        if not w:
+            return 0
+        return sum(w) + min(self._brute(w[:r]) + self._brute(w[r+1:])
+                            for r in range(len(w)))
+
+    def _cost(self, preorder, w):
+        import bst
+        depths = bst.Tree(preorder).depths()
+        return sum(depths[k]*v for k, v in w.items())
+
+    def test_optimal(self):
+        """Test Knuth's tree against every tree on small weight sets."""
+        seed(22)
+        for n in range(1, 9):
+            w = {k: randrange(1, 20) for k in range(n)}
+            self.assertEqual(self._brute([w[k] for k in range(n)]),
+                             self._cost(optimal_preorder(w), w))
+        self.assertEqual([2, 1, 3], optimal_preorder([1, 2, 2, 3, 2]))
+        self.assertEqual([], optimal_preorder([]))
+
+    def test_mehlhorn(self):
+        """Test each key lies within log2(W/w) + 1 of the root."""
+        import bst
+        seed(23)
+        X = [randrange(60)**2 % 97 for _ in range(2000)]
+        keys, w = weights(X)
+        depths = bst.Tree(mehlhorn_preorder(X)).depths()
+        for k, v in zip(keys, w):
+            self.assertTrue(depths[k] <= log(len(X)/float(v), 2) + 1)
+        self.assertEqual(sorted(keys), sorted(mehlhorn_preorder(X)))
+        self.assertEqual([], mehlhorn_preorder([]))
+
+    def test_costs(self):
+        """Test the costs of X on both trees, against the optimum."""
+        seed(24)
+        X = [min(randrange(50), randrange(50)) for _ in range(3000)]
+        costs = static_costs(X)
+        self.assertEqual(costs["optimal"],
+                         self._cost(optimal_preorder(X), Counter(X)))
+        self.assertTrue(entropy(X)/log(3, 2) <= costs["optimal"] <=
+                        costs["mehlhorn"] <= entropy(X) + 2*len(X))
+        self.assertEqual(arraysim.splay_cost(X), costs["splay"])
+
+
+if __name__ == '__main__':
+    benchmark()
+    unittest.main()
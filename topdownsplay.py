@@ -359,6 +359,211 @@ class ABCSplay(six.with_metaclass(abc.ABCMeta)):
             prev_key = key
             key = self.predecessor(prev_key)
 
+    def _empty(self):
+        """Empty tree of the same type, whatever its constructor takes."""
+        T = type(self).__new__(type(self))
+        ABCSplay.__init__(T)
+        return T
+
+    def copy(self):
+        """Return a tree of the same shape holding the same keys."""
+        T = self._empty()
+        if self.root is None:
+            return T
+        T.root = BinaryNode(self.root.key)
+        stack = [(self.root, T.root)]
+        while stack:
+            x, y = stack.pop()
+            if x.left is not None:
+                y.left = BinaryNode(x.left.key)
+                stack.append((x.left, y.left))
+            if x.right is not None:
+                y.right = BinaryNode(x.right.key)
+                stack.append((x.right, y.right))
+        return T
+
+    # Set algebra by splitting and joining.
+    #
+    # Merging m keys into a tree of n by inserting them one at a time costs
+    # O(m log n). Instead we peel off runs: splay the minimum x of one tree
+    # to its root, split the other tree at x, and append the part below x
+    # to the output before swapping the roles of the two trees. The splays
+    # all happen near the left ends of the trees and the right end of the
+    # output, so by the dynamic finger property a run of length r costs
+    # O(log(r+1)) amortized, which is O(m log(n/m + 1)) over all the runs
+    # when the inputs interleave.
+    #
+    # Intersections and differences keep a subset of the tree, so the
+    # other tree is split at each run of the tree's keys and joined back
+    # together behind it, with the same finger bound and no copy. Unions
+    # and symmetric differences merge with a copy of the other tree, which
+    # costs no more than the output it joins. The new-tree variants copy
+    # the smaller of the two trees where they can.
+
+    def _smaller(self, other):
+        """Does the tree hold no more keys than the tree other? Walks both
+        in step, so costs O(min(m, n))."""
+        end = object()
+        b = iter(other)
+        for _ in self:
+            if next(b, end) is end:
+                return False
+        return True
+
+    def _split(self, key):
+        """Split tree into subtrees with keys < key and keys >= key."""
+        self.splay(key)
+        r = self.root
+        if r.key < key:
+            ge = r.right
+            r.right = None
+            return r, ge
+        lt = r.left
+        r.left = None
+        return lt, r
+
+    def _append(self, t):
+        """Join the subtree t, all of whose keys are larger, onto the tree."""
+        if t is None:
+            return
+        if self.root is None:
+            self.root = t
+        else:
+            self.splay(Inf)
+            self.root.right = t
+
+    def _merge(self, other, keep_self, keep_other, keep_both):
+        """Destructively merge other into self, keeping the keys only in
+        self, only in other, or in both, as flagged."""
+        out = self._empty()
+        X, Y = self, other
+        kx, ky = keep_self, keep_other
+        while True:
+            if Y.root is None:
+                if kx:
+                    out._append(X.root)
+                break
+            if X.root is None:
+                if ky:
+                    out._append(Y.root)
+                break
+            X.splay(NegInf)
+            x = X.root
+            lt, ge = Y._split(x.key)
+            if ky:
+                out._append(lt)
+            Y.root = ge
+            if ge is not None and ge.key == x.key:
+                Y.root = ge.right
+                X.root = x.right
+                if keep_both:
+                    x.right = None
+                    out._append(x)
+            X, Y, kx, ky = Y, X, ky, kx
+        self.root = out.root
+        other.root = None
+
+    def _filter(self, other, keep_common):
+        """Keep the keys of the tree that are also in the tree other, or
+        those that are not, as flagged. other is split and joined back, so
+        it ends with the same keys."""
+        if other is self:
+            if not keep_common:
+                self.root = None
+            return
+        out = self._empty()
+        passed = self._empty()  # The keys of other below the current run
+        rest = self._empty()
+        rest.root = other.root
+        while self.root is not None and rest.root is not None:
+            self.splay(NegInf)
+            x = self.root
+            lt, ge = rest._split(x.key)
+            passed._append(lt)
+            common = ge is not None and ge.key == x.key
+            if common:
+                rest.root = ge.right
+                ge.right = None
+                passed._append(ge)
+            else:
+                rest.root = ge
+            self.root = x.right
+            x.right = None
+            # No later key of the tree below the next key of other is in
+            # other
+            if rest.root is not None and self.root is not None:
+                rest.splay(NegInf)
+                run, self.root = self._split(rest.root.key)
+            else:
+                run, self.root = self.root, None
+            if common == keep_common:
+                out._append(x)
+            if not keep_common:
+                out._append(run)
+        if not keep_common:
+            out._append(self.root)
+        passed._append(rest.root)
+        other.root = passed.root
+        self.root = out.root
+
+    def _operand(self, other):
+        """Tree that _merge may consume: a copy of a tree, or a new tree on
+        the keys of any other iterable."""
+        if isinstance(other, ABCSplay):
+            return other.copy()
+        T = self._empty()
+        for k in other:
+            T.insert(k)
+        return T
+
+    def update(self, other):
+        """Add the keys of other to the tree."""
+        self._merge(self._operand(other), True, True, True)
+
+    def intersection_update(self, other):
+        """Keep only the keys also in other."""
+        if not isinstance(other, ABCSplay):
+            other = self._operand(other)
+        self._filter(other, True)
+
+    def difference_update(self, other):
+        """Remove the keys of other from the tree."""
+        if not isinstance(other, ABCSplay):
+            other = self._operand(other)
+        self._filter(other, False)
+
+    def symmetric_difference_update(self, other):
+        """Keep the keys in exactly one of the tree and other."""
+        self._merge(self._operand(other), True, True, False)
+
+    def union(self, other):
+        T = self.copy()
+        T.update(other)
+        return T
+
+    def intersection(self, other):
+        """New tree on the keys in both, built from a copy of the smaller
+        of the two."""
+        if not isinstance(other, ABCSplay):
+            other = self._operand(other)
+        small, big = (self, other) if self._smaller(other) else (other, self)
+        T = self._empty()
+        T.root = small.copy().root
+        T.intersection_update(big)
+        return T
+
+    def difference(self, other):
+        """New tree on the keys not in other. Built from a copy of the tree,
+        as the result is no smaller than the tree less other."""
+        T = self.copy()
+        T.difference_update(other)
+        return T
+
+    def symmetric_difference(self, other):
+        T = self.copy()
+        T.symmetric_difference_update(other)
+        return T
+
     @abc.abstractmethod
     def splay(self):
         return None
@@ -499,6 +704,18 @@ class AccessTree(SimpleSplayTree):
         self._set = set(l)
         self._accesses = []
 
+    def copy(self):
+        T = super(AccessTree, self).copy()
+        T._set = set(self._set)
+        T._accesses = list(self._accesses)
+        return T
+
+    def _fixed_keys(self, other):
+        raise TypeError("AccessTree holds the fixed keys 0...n-1")
+
+    update = intersection_update = difference_update = _fixed_keys
+    symmetric_difference_update = _fixed_keys
+
     def _binary_search(self, x):
         """Do a binary search on the splay tree, return access pattern."""
         search_encoding = []
@@ -650,6 +867,121 @@ class TestSimpleSplay(unittest.TestCase):
         self.assertEqual((0, 8, 6, 4, 2, 1, 3, 5, 7, 9), t.preorder())
 
 
+class TestSetAlgebra(unittest.TestCase):
+
+    def test_operations(self):
+        """Test set operations against python sets."""
+        from random import randrange, seed
+        seed(4)
+        for cls in (SimpleSplayTree, TDSplayTree):
+            for _ in range(30):
+                a = {randrange(200) for _ in range(randrange(100))}
+                b = {randrange(200) for _ in range(randrange(100))}
+                A = cls(a)
+                B = cls(b)
+                a_shape = A.preorder()
+                self.assertEqual(sorted(a | b), list(A.union(B)))
+                self.assertEqual(sorted(a - b), list(A.difference(B)))
+                self.assertEqual(sorted(a ^ b),
+                                 list(A.symmetric_difference(B)))
+                self.assertEqual(sorted(a | b), list(A.union(b)))
+                # The new-tree variants leave the tree itself unchanged,
+                # and only search the operand
+                self.assertEqual(a_shape, A.preorder())
+                self.assertEqual(sorted(b), list(B))
+                # An intersection copies the smaller tree and searches the
+                # other, so either may change shape but not keys
+                self.assertEqual(sorted(a & b), list(A.intersection(B)))
+                self.assertEqual(sorted(a & b), list(A.intersection(b)))
+                self.assertEqual(sorted(a), list(A))
+                self.assertEqual(sorted(b), list(B))
+                # Either side may be the smaller
+                self.assertEqual(sorted(b & a), list(B.intersection(A)))
+                self.assertEqual(sorted(b - a), list(B.difference(A)))
+
+    def test_in_place(self):
+        """Test in-place variants modify only the tree itself."""
+        A = SimpleSplayTree(range(0, 50, 2))
+        B = SimpleSplayTree(range(0, 50, 3))
+        A.update(B)
+        self.assertEqual(sorted(set(range(0, 50, 2)) | set(range(0, 50, 3))),
+                         list(A))
+        self.assertEqual(list(range(0, 50, 3)), list(B))
+        A.difference_update(B)
+        self.assertEqual([k for k in range(50) if k % 2 == 0 and k % 3],
+                         list(A))
+        A.symmetric_difference_update(range(0, 50, 4))
+        self.assertEqual(
+            sorted({k for k in range(50) if k % 2 == 0 and k % 3} ^
+                   set(range(0, 50, 4))),
+            list(A))
+        A.intersection_update([])
+        self.assertFalse(A)
+        A.update([3, 1, 2])
+        self.assertEqual([1, 2, 3], list(A))
+
+    def test_small_against_large(self):
+        """Test a small tree is not charged for the size of a large one:
+        few splays, and no nodes copied beyond the small tree."""
+        splays = []
+
+        class Counted(SimpleSplayTree):
+            def splay(self, key):
+                splays.append(key)
+                return SimpleSplayTree.splay(self, key)
+
+        made = []
+        init = BinaryNode.__init__
+
+        def counted_init(x, key):
+            if key is not None:  # Not a tree's header
+                made.append(key)
+            init(x, key)
+
+        n, m = 10**5, 30
+        big = Counted(range(0, 2*n, 2))
+        small = Counted(range(10, 10+m))
+        del splays[:]
+        BinaryNode.__init__ = counted_init
+        try:
+            self.assertEqual(list(range(10, 10+m, 2)),
+                             list(big.intersection(small)))
+            self.assertEqual(list(range(10, 10+m, 2)),
+                             list(small.intersection(big)))
+            small.intersection_update(big)
+            small.difference_update(big)
+        finally:
+            BinaryNode.__init__ = init
+        self.assertLessEqual(len(made), 2*m)
+        self.assertLess(len(splays), 40*m)
+        self.assertEqual([], list(small))
+        self.assertEqual(list(range(0, 2*n, 2)), list(big))
+
+    def test_access_tree(self):
+        """Test AccessTree copies, and refuses to change its keys."""
+        A = AccessTree(5)
+        A.access(3)
+        B = A.copy()
+        self.assertEqual(A.preorder(), B.preorder())
+        B.access(1)
+        self.assertEqual(A._accesses, B._accesses[:len(A._accesses)])
+        self.assertNotEqual(A._accesses, B._accesses)
+        self.assertRaises(ValueError, B.access, 7)
+        self.assertRaises(TypeError, A.update, [7])
+        self.assertRaises(TypeError, A.union, [7])
+        self.assertRaises(TypeError, A.intersection_update, [1])
+
+    def test_copy(self):
+        """Test copies keep the shape but share no nodes."""
+        A = TDSplayTree(range(20))
+        5 in A
+        B = A.copy()
+        self.assertEqual(A.preorder(), B.preorder())
+        self.assertIsInstance(B, TDSplayTree)
+        B.remove(5)
+        self.assertIn(5, A)
+
+
 class TestExtrema(unittest.TestCase):
 
     def test_least_upper_bound(self):
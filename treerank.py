@@ -62,6 +62,19 @@ def irank(i, n):
     return p
 
 
+def rank(p):
+    """Rank from 1 of the tree with preorder p among the trees on len(p)
+    keys, the inverse of irank."""
+    n = len(p)
+    if n == 0:
+        return 1
+    left = [k for k in p if k < p[0]]
+    right = [k for k in p if k > p[0]]
+    j = len(left)
+    return (sum(G(t, n) for t in range(j)) + (rank(left)-1)*B(n-j-1) +
+            rank(right))
+
+
 def treegen(n):
     """Generate BST preorders on n nodes."""
     if n:
@@ -102,6 +115,14 @@ class TestTreeranks(unittest.TestCase):
         self.assertEqual(four_node_trees, list(treegen(4)))
         self.assertEqual(sorted(list(treegen(6))), list(treegen(6)))
 
+    def test_rank(self):
+        """Test rank inverts irank, on any keys."""
+        for n in range(1, 8):
+            for i, p in enumerate(treegen(n)):
+                self.assertEqual(i+1, rank(p))
+                self.assertEqual(i+1, rank([10*k for k in p]))
+        self.assertEqual(1, rank(()))
+
 
 if __name__ == '__main__':
     unittest.main()
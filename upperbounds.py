@@ -0,0 +1,177 @@
+"""Upper bounds on the cost of an access sequence, to set beside splaying.
+
+Every bound is a sum of per-access terms log2(1 + d), each for its own
+distance d of the access from the past:
+
+    working set      the number of distinct keys accessed since the last
+                     access of the same key, counting it (every key seen
+                     so far, and it, on a first access);
+    dynamic finger   the difference in rank from the previous access;
+    static entropy   m/f - 1 for f the number of accesses of the key, so
+                     the term is log2(m/f);
+    unified          the least, over keys y accessed before, of the number
+                     of accesses since the last one of y plus the
+                     difference in rank from y, capped by the working set
+                     and finger distances.
+
+Splay trees meet the first three up to constant factors; the unified bound
+is only conjectured for them. Counting accesses rather than distinct keys
+makes the unified distance no smaller than Iacono's, and lets it be found
+with prefix maxima: each side of the accessed rank wants the largest last
+access time plus (or minus) rank. Fenwick trees over access times and over
+ranks make every bound O(m log n)."""
+from __future__ import print_function
+
+import unittest
+
+from collections import Counter
+from math import log
+from random import randrange, seed
+from time import time
+
+import arraysim
+from fenwick import Fenwick
+from wilber import bitReversalSequence
+
+
+def working_set_distances(X):
+    X = list(X)
+    F = Fenwick(len(X))  # One at the last access time of every key
+    last = {}
+    d = []
+    for i, k in enumerate(X):
+        if k in last:
+            p = last[k]
+            d.append(F.prefix(i-1) - F.prefix(p-1))
+            F.add(p, -1)
+        else:
+            d.append(len(last) + 1)
+        F.add(i, 1)
+        last[k] = i
+    return d
+
+
+def finger_distances(X):
+    r = arraysim.ranks(X)[1].tolist()
+    return [abs(x - y) for x, y in zip(r, r[:1] + r)]
+
+
+def entropy_distances(X):
+    X = list(X)
+    f = Counter(X)
+    return [len(X)/float(f[k]) - 1 for k in X]
+
+
+def unified_distances(X):
+    r = arraysim.ranks(X)[1].tolist()
+    n = len(set(r))
+    NONE = -len(r) - n - 1
+    # Largest last access time plus rank at or below each rank, and minus
+    # rank at or above it (on reversed ranks)
+    below = Fenwick(n, max, NONE)
+    above = Fenwick(n, max, NONE)
+    d = []
+    for i, (x, w, f) in enumerate(zip(r, working_set_distances(X),
+                                      finger_distances(X))):
+        best = min(w, f) if i else 0
+        v = below.prefix(x)
+        if v != NONE:
+            best = min(best, i - v + x)
+        v = above.prefix(n-1-x)
+        if v != NONE:
+            best = min(best, i - v - x)
+        d.append(best)
+        below.add(x, i + x)
+        above.add(n-1-x, i - x)
+    return d
+
+
+distances = (("working_set", working_set_distances),
+             ("dynamic_finger", finger_distances),
+             ("static_entropy", entropy_distances),
+             ("unified", unified_distances))
+
+
+def per_access(X):
+    """{bound: list of the log2(1 + d) term of each access}."""
+    X = list(X)
+    return {name: [log(1 + d, 2) for d in f(X)] for name, f in distances}
+
+
+def bounds(X):
+    """{bound: total} for each bound, with the splay cost of X beside them
+    under "splay"."""
+    X = list(X)
+    totals = {name: sum(terms) for name, terms in per_access(X).items()}
+    totals["splay"] = arraysim.splay_cost(X) if X else 0
+    return totals
+
+
+def benchmark(n=1000, m=10**5):
+    traces = (("random", [randrange(n) for _ in range(m)]),
+              ("sequential", [i % n for i in range(m)]),
+              ("bit reversal", bitReversalSequence(10)*(m >> 10)),
+              ("local", [(i//10 + randrange(8)) % n for i in range(m)]))
+    names = [name for name, _ in distances] + ["splay"]
+    print("%-14s" % "" + "".join("%16s" % name for name in names))
+    for trace, X in traces:
+        ts = time()
+        totals = bounds(X)
+        print("%-14s" % trace +
+              "".join("%16.0f" % totals[name] for name in names) +
+              "   (%.2fs)" % (time() - ts))
+
+
+class TestUpperBounds(unittest.TestCase):
+
+    def _brute(self, X):
+        """Distances straight from their definitions, O(m^2)."""
+        r = arraysim.ranks(X)[1].tolist()
+        m = len(X)
+        ws, uni = [], []
+        for i, x in enumerate(r):
+            if x in r[:i]:
+                p = i - 1 - r[i-1::-1].index(x)
+                ws.append(len(set(r[p:i])))
+            else:
+                ws.append(len(set(r[:i])) + 1)
+            f = abs(x - r[i-1]) if i else 0
+            last = {y: j for j, y in enumerate(r[:i])}
+            uni.append(min([min(ws[-1], f) if i else 0] +
+                           [i - j + abs(x - y) for y, j in last.items()]))
+        finger = [abs(x - y) for x, y in zip(r, r[:1] + r)]
+        entropy = [m/float(r.count(x)) - 1 for x in r]
+        return ws, finger, entropy, uni
+
+    def test_against_definitions(self):
+        """Test every distance against its quadratic definition."""
+        seed(17)
+        for X in ([randrange(12) for _ in range(150)], list("splaytree"),
+                  [randrange(200) for _ in range(100)], [5], []):
+            self.assertEqual(self._brute(X),
+                             tuple(f(X) for _, f in distances))
+
+    def test_bounds(self):
+        """Test known totals and the unified bound stays below the rest."""
+        X = list(range(8))*4
+        totals = bounds(X)
+        self.assertAlmostEqual(log(9*8*7*6*5*4*3*2, 2) + 24*log(9, 2),
+                               totals["working_set"])
+        self.assertAlmostEqual(3*32, totals["static_entropy"])
+        # Wrapping around, the finger beats every recently accessed key
+        self.assertEqual([0] + ([1]*7 + [7])*3 + [1]*7, finger_distances(X))
+        self.assertEqual(finger_distances(X), unified_distances(X))
+        seed(18)
+        X = [randrange(40) for _ in range(300)]
+        terms = per_access(X)
+        for i in range(len(X)):
+            self.assertTrue(terms["unified"][i] <=
+                            min(terms["working_set"][i],
+                                terms["dynamic_finger"][i]) + 1e-9)
+        self.assertEqual(0, bounds([])["splay"])
+        self.assertEqual(arraysim.splay_cost(X), bounds(X)["splay"])
+
+
+if __name__ == '__main__':
+    benchmark()
+    unittest.main()
@@ -2,11 +2,14 @@
 from __future__ import print_function
 
 from functools import partial
-from random import shuffle
+from random import randrange, seed, shuffle
+
+import numpy as np
 
 from topdownsplay import Inf, NegInf
 from propersplay import complete_bst_preorder
 from pathcodes import SplayBound, MRBound, Node, move_to_root, splay
+from preorders import links
 
 import unittest
 
@@ -70,6 +73,84 @@ def wilber2(s):
     """Compute wilber2 bound for access sequence s."""
     return len(s) + sum(scores(s))
 
+
+def _reference_tree(s, reference):
+    """Keys, left and right child arrays and root, over ranks, of the
+    reference tree with the given preorder, by default the complete BST."""
+    if reference is None:
+        keys = sorted(set(s))
+        n = len(keys)
+        preorder = [k-1 for k in complete_bst_preorder(n.bit_length())
+                    if k <= n]
+    else:
+        reference = list(reference)
+        keys = sorted(reference)
+        if not set(s) <= set(keys):
+            raise ValueError("Reference tree must hold every accessed key")
+        rank = {k: i for i, k in enumerate(keys)}
+        preorder = [rank[k] for k in reference]
+    left = np.full(len(keys), -1, dtype=np.int64)
+    right = np.full(len(keys), -1, dtype=np.int64)
+    for x, y, is_left in links(preorder):
+        (left if is_left else right)[y] = x
+    return keys, left, right, preorder[0] if preorder else -1
+
+
+def interleaves(s, reference=None):
+    """Preferred-child switches of each node y of the reference tree (the
+    complete BST on the keys of s by default, or the tree with preorder
+    reference): the number of times consecutive accesses within the
+    subtree of y fall on different sides of it, y itself counting as left.
+
+    The accesses go down the tree a level at a time, all at once, kept
+    grouped by the node they have reached and in time order within each
+    group. Each level splits every group into its left and right accesses
+    by a counting pass of cumulative sums rather than a sort, so the whole
+    takes O(m) per level: O(m log n) on the default complete tree."""
+    keys, left, right, root = _reference_tree(s, reference)
+    rank = {k: i for i, k in enumerate(keys)}
+    x = np.array([rank[k] for k in s], dtype=np.int64)
+    y = np.full(len(x), root, dtype=np.int64)
+    switches = np.zeros(len(keys), dtype=np.int64)
+    while len(x):
+        side = x > y
+        switch = (y[1:] == y[:-1]) & (side[1:] != side[:-1])
+        switches += np.bincount(y[1:][switch], minlength=len(keys))
+        below = x != y
+        x, y, side = x[below], y[below], side[below]
+        if not len(x):
+            break
+        # Stable partition of each group: its left accesses, then its right
+        start = np.flatnonzero(np.r_[True, y[1:] != y[:-1]])
+        group = np.repeat(np.arange(len(start)),
+                          np.diff(np.r_[start, len(x)]))
+        lefts = np.cumsum(~side) - ~side  # Left accesses before each
+        before = lefts - lefts[start][group]
+        nleft = np.add.reduceat(~side, start)
+        offset = np.arange(len(x)) - start[group]
+        at = start[group] + np.where(side, nleft[group] + offset - before,
+                                     before)
+        order = np.empty(len(x), dtype=np.int64)
+        order[at] = np.arange(len(x))
+        x, y, side = x[order], y[order], side[order]
+        y = np.where(side, right[y], left[y])
+    return dict(zip(keys, switches.tolist()))
+
+
+def interleave_bound(s, reference=None):
+    """Total preferred-child switches over the reference tree."""
+    return sum(interleaves(s, reference).values())
+
+
+def wilber1(s, reference=None):
+    """Wilber's first lower bound on the cost of s, counting nodes on the
+    search paths as wilber2 does: OPT >= IB/2 - n, n the size of the
+    reference tree, in the form of Demaine et al. (Tango), and OPT >= m
+    as every access costs at least one. Returns the larger."""
+    n = len(reference) if reference is not None else len(set(s))
+    return max(len(s), (interleave_bound(s, reference) + 1)//2 - n)
+
+
 def binaryDigits(n):
     """Map integer n to list of binary digits."""
     # Lifted from StackOverflow
@@ -161,6 +242,49 @@ class TestWilber2(unittest.TestCase):
         B_16 = [0, 8, 4, 12, 2, 10, 6, 14, 1, 9, 5, 13, 3, 11, 7, 15]
         self.assertEqual(bitReversalSequence(4), B_16)
 
+    def test_interleaves(self):
+        """Test switch counts against walking every access down the tree."""
+        seed(14)
+        for s, reference in (([randrange(40) for _ in range(300)], None),
+                             ([randrange(10) for _ in range(100)],
+                              [3, 1, 0, 2, 7, 5, 4, 6, 8, 9]),
+                             ([5, 1, 5, 1], [9, 5, 1])):
+            keys = sorted(set(s))
+            if reference is None:
+                n = len(keys)
+                reference = [keys[k-1] for k in
+                             complete_bst_preorder(n.bit_length()) if k <= n]
+            # Brute force: each node's last side, found by searching down
+            children = {}
+            root = reference[0]
+            for k in reference[1:]:
+                y = root
+                while (y, k > y) in children:
+                    y = children[y, k > y]
+                children[y, k > y] = k
+            last = {}
+            switches = dict.fromkeys(reference, 0)
+            for k in s:
+                y = root
+                while True:
+                    side = k > y
+                    if y in last and last[y] != side:
+                        switches[y] += 1
+                    last[y] = side
+                    if k == y:
+                        break
+                    y = children[y, side]
+            self.assertEqual(switches, interleaves(s, reference))
+        self.assertEqual(4, interleave_bound([1, 3, 1, 3, 2]))
+        self.assertEqual(5, wilber1([1, 3, 1, 3, 2]))
+        # Repeating the bit reversal, the interleaves outgrow the accesses
+        s = bitReversalSequence(7)*4
+        bound = (interleave_bound(s) + 1)//2 - 128
+        self.assertTrue(bound > len(s))
+        self.assertEqual(bound, wilber1(s))
+        with self.assertRaises(ValueError):
+            interleaves([1, 2], [1])
+
     def test_wilber2(self):
         """Test on the bit-reversal sequence."""
         for k in range(1, 8):
@@ -9,6 +9,7 @@ except ImportError:
 
 import unittest
 
+import depthmaps
 from pathcodes import Node, splay, SplayBound, SplayZigs
 from wilber import wilber2, scores
 
@@ -69,31 +70,31 @@ def tree_nodes(movements):
     return dict(enumerate(t.inorder(), start=1))
 
 
-def max_ratio(n, k, t=None):
+def max_ratio(n, k, t=None, encode=True):
     """Greedily splay continually at the node with largest ratio of number of
     zig-zigs to number of zig-zags on the path. In case of tie, go for
-    'deepest' node."""
+    'deepest' node. The maps are kept by depthmaps rather than recomputed;
+    encode=False skips the encodings, which take O(n) each."""
     if t is None:
         t = tree_nodes("r"*(n-1))
+    maps = depthmaps.DepthMaps(t[i] for i in range(1, n+1))
+    index = depthmaps.RatioIndex(maps)
     zig_counts = []
     zag_counts = []
     counts = []
     s = []
     encodings = []
     for _ in range(k):
-        zig_depths = zigzig_depths(t[1].root())
-        zag_depths = zagzig_depths(t[1].root())
-        t_depths = depths(t[1].root())
-        ratio = {}
-        for i in range(1, n+1):
-            ratio[i] = (1.*zig_depths[i]/max(1, zag_depths[i]), -zag_depths[i], t_depths[i])
-        next_key = max(ratio, key=ratio.__getitem__)
-        zig_counts.append(zig_depths[next_key])
-        zag_counts.append(zag_depths[next_key])
-        counts.append(t_depths[next_key])
+        x = index.best()
+        next_key = maps.rank[id(x)] + 1
+        t_depth, zig_depth, zag_depth = maps.value(x)
+        zig_counts.append(zig_depth)
+        zag_counts.append(zag_depth)
+        counts.append(t_depth)
         s.append(next_key)
-        encodings.append(t[next_key].encode())
-        t[next_key].splay()
+        if encode:
+            encodings.append(x.encode())
+        maps.splay(x)
     return (s, counts, zig_counts, zag_counts, encodings)
 
 